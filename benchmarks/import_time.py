@@ -0,0 +1,69 @@
+# benchmarks/import_time.py
+#
+# Measures the cold import time of the application in a fresh interpreter and
+# checks it against a budget. Run from the repository root:
+#
+#     python benchmarks/import_time.py
+#
+# Importing must not read configuration: the script also fails if monitor.settings
+# was resolved during import.
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Whole `import main`, dominated by FastAPI/pydantic, and the monitor's own modules.
+TOTAL_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+OWN_BUDGET_MS = float(os.getenv("IMPORT_OWN_BUDGET_MS", "100"))
+RUNS = int(os.getenv("IMPORT_RUNS", "5"))
+
+PROBE = (
+    "import main; "
+    "from monitor.settings import get_settings; "
+    "print('SETTINGS_LOADED', get_settings.cache_info().currsize)"
+)
+
+
+def measure_once() -> tuple[float, float, bool]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    own_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if name == "main":
+            total_us = int(cumulative_us)
+        if name == "main" or name == "monitor" or name.startswith("monitor."):
+            own_us += int(self_us)
+
+    settings_loaded = "SETTINGS_LOADED 0" not in result.stdout
+    return total_us / 1000, own_us / 1000, settings_loaded
+
+
+def main() -> int:
+    samples = [measure_once() for _ in range(RUNS)]
+    total_ms = min(sample[0] for sample in samples)
+    own_ms = min(sample[1] for sample in samples)
+    settings_loaded = any(sample[2] for sample in samples)
+
+    print(f"import main: {total_ms:.1f} ms (budget {TOTAL_BUDGET_MS:.0f} ms), best of {RUNS}")
+    print(f"monitor modules: {own_ms:.1f} ms (budget {OWN_BUDGET_MS:.0f} ms)")
+    print(f"settings resolved at import: {settings_loaded}")
+
+    ok = total_ms <= TOTAL_BUDGET_MS and own_ms <= OWN_BUDGET_MS and not settings_loaded
+    print("OK" if ok else "OVER BUDGET")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
 # monitor/main.py
 
-import os
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from monitor.constants import DEFAULT_CONN_STRING
+from monitor.settings import get_settings
 from monitor.database.engine import init_db
+from monitor.database.connection import close_pools
+from monitor.collector import collector
+from monitor.operations import (
+    alerts as alerts_operations,
+    generalities as generalities_operations,
+    queries as queries_operations,
+    replication as replication_operations,
+    tables as tables_operations,
+)
 
-from monitor.routers import generalities, tables
+from monitor.routers import alerts, generalities, queries, replication, tables
 
 
 @asynccontextmanager
@@ -17,12 +25,24 @@ async def lifespan(app: FastAPI):
     """
     print('Initializing MONITOR Server...')
     try:
-        await init_db(DEFAULT_CONN_STRING)
+        settings = get_settings()
+        print(f"Settings: {settings.summary()}")
+        init_conn = await init_db(settings.default_conn_string)
+        await init_conn.close() # Requests use the connection pools from here on
+        generalities_operations.register_samplers(collector)
+        tables_operations.register_samplers(collector)
+        replication_operations.register_samplers(collector)
+        queries_operations.register_samplers(collector)
+        alerts_operations.register_alerts(collector)
+        collector.start()
         print('...MONITOR Server ON...')
         yield
     except Exception as e:
         print(f"Failed to start MONITOR initialization error: {e}")
         raise # Re-raise to prevent server from starting if DB init fails
+    finally:
+        await collector.stop()
+        await close_pools()
 
     print('...MONITOR Server DOWN YO!...')
 
@@ -35,4 +55,7 @@ async def read_root():
 # routers
 app.include_router(generalities.router)
 app.include_router(tables.router)
+app.include_router(replication.router)
+app.include_router(alerts.router)
+app.include_router(queries.router)
 
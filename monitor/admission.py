@@ -0,0 +1,195 @@
+# monitor/admission.py
+import asyncio
+import fcntl
+import time
+from contextlib import asynccontextmanager
+
+from fastapi.responses import JSONResponse
+
+from monitor.settings import get_settings
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted, either because the wait queue of its
+    cost class is full (429) or because it waited too long for a slot (503).
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def to_response(self) -> JSONResponse:
+        return JSONResponse(
+            content={"error": str(self)},
+            status_code=self.status_code,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class CostClass:
+    """
+    A concurrency limit shared by every endpoint of the same cost.
+
+    At most `max_concurrent` requests run at once and at most `max_queue` requests
+    wait for a slot. Anything beyond that is rejected immediately, and a waiting
+    request gives up after `wait_seconds`.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 wait_seconds: float, retry_after: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        # Counted with our own counters: on Python < 3.12 wait_for acquires in a separate
+        # task, so the semaphore is not yet locked while a burst is still being admitted.
+        if self.running + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Too many '{self.name}' requests in flight, try again later.",
+                status_code=429,
+                retry_after=self.retry_after,
+            )
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Timed out waiting for a '{self.name}' slot, try again later.",
+                status_code=503,
+                retry_after=self.retry_after,
+            )
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'running': self.running,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+        }
+
+
+# Built from the settings on first use.
+_cost_classes = {}
+
+# Global budget on concurrent Postgres work, shared by every endpoint, so the
+# monitor never holds more than pg_max_concurrent_work backends on the server.
+# Within a worker the semaphore queues requests; across the workers of the host
+# each unit of work also holds an flock on one of pg_max_concurrent_work slot
+# files, which the kernel releases if the worker dies.
+_pg_work_semaphore = None
+_slot_files = {}  # slot index -> open slot file of this worker
+_slots_held = set()  # slot indexes this worker holds
+
+# How often a worker retries the slot files while every slot is held elsewhere.
+_SLOT_POLL_SECONDS = 0.05
+
+
+def _get_cost_classes() -> dict:
+    if not _cost_classes:
+        for name, limits in get_settings().admission_limits.items():
+            _cost_classes[name] = CostClass(name, **limits)
+    return _cost_classes
+
+
+def admit(cost_class: str):
+    """
+    Returns the admission context manager for the given cost class
+    ('cheap', 'catalog' or 'scan').
+    """
+    return _get_cost_classes()[cost_class].slot()
+
+
+def _try_host_slot() -> int | None:
+    """
+    Locks a free slot file of the host-wide work budget and returns its index,
+    or None if every slot is held.
+    """
+    settings = get_settings()
+    for index in range(settings.pg_max_concurrent_work):
+        if index in _slots_held:
+            continue
+        slot_file = _slot_files.get(index)
+        if slot_file is None:
+            slot_file = _slot_files[index] = open(f"{settings.pg_work_lock_path}.{index}", 'a')
+        try:
+            fcntl.flock(slot_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            continue
+        _slots_held.add(index)
+        return index
+    return None
+
+
+def _release_host_slot(index: int):
+    _slots_held.discard(index)
+    fcntl.flock(_slot_files[index].fileno(), fcntl.LOCK_UN)
+
+
+def _budget_exhausted() -> AdmissionRejected:
+    wait_seconds = get_settings().pg_work_wait_seconds
+    return AdmissionRejected(
+        "Postgres work budget exhausted, try again later.",
+        status_code=503,
+        retry_after=max(1, int(wait_seconds)),
+    )
+
+
+@asynccontextmanager
+async def pg_work_slot():
+    """
+    Holds one unit of the host-wide Postgres work budget for the duration of the block.
+    Raises AdmissionRejected (503) if no unit frees up within pg_work_wait_seconds.
+    """
+    global _pg_work_semaphore
+
+    settings = get_settings()
+    if _pg_work_semaphore is None:
+        _pg_work_semaphore = asyncio.Semaphore(settings.pg_max_concurrent_work)
+    deadline = time.monotonic() + settings.pg_work_wait_seconds
+    try:
+        await asyncio.wait_for(_pg_work_semaphore.acquire(), timeout=settings.pg_work_wait_seconds)
+    except asyncio.TimeoutError:
+        raise _budget_exhausted()
+    try:
+        # The rest of the budget is held by other workers until a slot file frees up
+        index = _try_host_slot()
+        while index is None:
+            if time.monotonic() >= deadline:
+                raise _budget_exhausted()
+            await asyncio.sleep(_SLOT_POLL_SECONDS)
+            index = _try_host_slot()
+    except BaseException:
+        _pg_work_semaphore.release()
+        raise
+    try:
+        yield
+    finally:
+        _release_host_slot(index)
+        _pg_work_semaphore.release()
+
+
+def admission_stats() -> dict:
+    return {name: cost_class.stats() for name, cost_class in _get_cost_classes().items()}
@@ -0,0 +1,306 @@
+# monitor/alerts.py
+import asyncio
+import fnmatch
+import json
+import operator
+import time
+
+from monitor.collector import sample_rates
+from monitor.settings import get_settings
+
+_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Fields naming the entries of a list inside a snapshot. The entry is addressed by
+# that field instead of its position, e.g. 'maintenance.mydb.tables.public.orders.n_dead_tup'.
+_LIST_KEYS = ('table', 'slot_name', 'partition', 'application_name')
+
+
+def flatten_metrics(value, prefix: str, series: dict):
+    """
+    Collects every number in a snapshot into series as dotted path -> float.
+    """
+    if isinstance(value, (int, float)): # bools included, as 0.0 and 1.0
+        series[prefix] = float(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            flatten_metrics(item, f"{prefix}.{key}", series)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            name = next((item[key] for key in _LIST_KEYS if isinstance(item, dict) and key in item), i)
+            flatten_metrics(item, f"{prefix}.{name}", series)
+
+
+class AlertRule:
+    """
+    A declarative alert rule. See the alert settings for the meaning of each field.
+    """
+
+    def __init__(self, name: str, metric: str, op: str = '>', threshold: float = 0.0,
+                 kind: str = 'threshold', per_seconds: float = 1.0, for_seconds: float = 0.0,
+                 resolve_after_seconds: float = None, severity: str = 'warning'):
+        if op not in _OPERATORS:
+            raise ValueError(f"Rule '{name}': unknown operator '{op}'.")
+        if kind not in ('threshold', 'rate'):
+            raise ValueError(f"Rule '{name}': kind must be 'threshold' or 'rate'.")
+        source, _, path = metric.partition('.')
+        if not path:
+            raise ValueError(f"Rule '{name}': metric must look like '<snapshot>.<path>'.")
+        self.name = name
+        self.metric = metric
+        self.source = source
+        self.op = op
+        self.threshold = float(threshold)
+        self.kind = kind
+        self.per_seconds = float(per_seconds)
+        self.for_seconds = float(for_seconds)
+        self.resolve_after_seconds = resolve_after_seconds
+        self.severity = severity
+
+    def holds(self, value) -> bool:
+        return value is not None and _OPERATORS[self.op](value, self.threshold)
+
+    def describe(self) -> dict:
+        return {
+            'name': self.name,
+            'metric': self.metric,
+            'kind': self.kind,
+            'op': self.op,
+            'threshold': self.threshold,
+            'per_seconds': self.per_seconds if self.kind == 'rate' else None,
+            'for_seconds': self.for_seconds,
+            'resolve_after_seconds': self.resolve_after_seconds,
+            'severity': self.severity,
+        }
+
+
+def load_rules() -> list[AlertRule]:
+    """
+    Builds the rules from the alert_rules setting and the alert_rules_path file.
+    Invalid or duplicate rules are reported and skipped.
+    """
+    settings = get_settings()
+    specs = list(settings.alert_rules)
+    if settings.alert_rules_path:
+        try:
+            with open(settings.alert_rules_path) as rules_file:
+                specs.extend(json.load(rules_file))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read alert rules from '{settings.alert_rules_path}': {e}")
+
+    rules = {}
+    for spec in specs:
+        try:
+            rule = AlertRule(**spec)
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Skipping invalid alert rule {spec}: {e}")
+            continue
+        if rule.name in rules:
+            print(f"Warning: Skipping duplicate alert rule '{rule.name}'.")
+            continue
+        rules[rule.name] = rule
+    return list(rules.values())
+
+
+def _post_json(url: str, payload: dict):
+    import urllib.request # Only needed when a webhook is configured
+
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=5):
+        pass
+
+
+class AlertEngine:
+    """
+    Evaluates the alert rules on the collector after every tick and stores the alert
+    state in the snapshot store under 'alerts', so every worker can serve it.
+
+    Work is incremental: a snapshot is flattened and its rules are evaluated only when
+    the sampler has written a new version of it, and the series each rule matches are
+    recomputed only when the set of series changes. Between versions only the pending
+    and firing alerts are advanced. There is one alert per rule and series, and only
+    transitions (firing, resolved) are sent to the sinks.
+    """
+
+    def __init__(self):
+        self._rules = None
+        self._rules_by_source = {}
+        self._versions = {}  # snapshot name -> updated_at of the version last evaluated
+        self._matches = {}  # snapshot name -> (series names, {rule name: matching series})
+        self._alerts = None  # alert id -> pending or firing alert
+        self._resolved = []  # recently resolved alerts, newest first
+
+    def get_rules(self) -> list[AlertRule]:
+        if self._rules is None:
+            self._rules = load_rules()
+            for rule in self._rules:
+                self._rules_by_source.setdefault(rule.source, []).append(rule)
+        return self._rules
+
+    def _load(self, store):
+        # A newly elected collector carries on with the alerts of the previous one
+        snapshot = store.get('alerts')
+        state = snapshot[0] if snapshot else {}
+        self._alerts = {alert['id']: alert for alert in state.get('pending', []) + state.get('firing', [])}
+        self._resolved = state.get('resolved', [])
+
+    def _matching_series(self, source: str, series: dict) -> dict:
+        names = list(series)
+        cached = self._matches.get(source)
+        if cached is None or cached[0] != names:
+            matched = {
+                rule.name: fnmatch.filter(names, rule.metric)
+                for rule in self._rules_by_source[source]
+            }
+            cached = self._matches[source] = (names, matched)
+        return cached[1]
+
+    def _observe(self, rule: AlertRule, name: str, value, now: float):
+        alert_id = f"{rule.name}:{name}"
+        alert = self._alerts.get(alert_id)
+        holds = rule.holds(value)
+        if alert is None:
+            if holds:
+                self._alerts[alert_id] = {
+                    'id': alert_id,
+                    'rule': rule.name,
+                    'series': name,
+                    'severity': rule.severity,
+                    'state': 'pending',
+                    'value': value,
+                    'op': rule.op,
+                    'threshold': rule.threshold,
+                    'holds': True,
+                    'started_at': now,
+                    'fired_at': None,
+                    'cleared_at': None,
+                    'resolved_at': None,
+                }
+            return
+        alert['holds'] = holds
+        if value is not None:
+            alert['value'] = value
+
+    def _evaluate_source(self, source: str, series: dict, now: float):
+        settings = get_settings()
+        rules = self._rules_by_source[source]
+        matched = self._matching_series(source, series)
+
+        rate_series = {name for rule in rules if rule.kind == 'rate' for name in matched[rule.name]}
+        rates = {}
+        if rate_series:
+            rates = sample_rates(
+                f"alert_samples:{source}",
+                {name: series[name] for name in rate_series},
+                settings.alert_rate_min_sample_seconds,
+                allow_negative=True,
+            )
+
+        for rule in rules:
+            for name in matched[rule.name]:
+                if rule.kind == 'rate':
+                    rate = rates.get(name)
+                    value = rate * rule.per_seconds if rate is not None else None
+                else:
+                    value = series[name]
+                self._observe(rule, name, value, now)
+
+        # Series that disappeared (a dropped table, a removed slot) no longer hold
+        current = {(rule.name, name) for rule in rules for name in matched[rule.name]}
+        for alert in self._alerts.values():
+            if alert['series'].startswith(f"{source}.") and (alert['rule'], alert['series']) not in current:
+                alert['holds'] = False
+
+    def _advance(self, now: float) -> list[dict]:
+        settings = get_settings()
+        rules = {rule.name: rule for rule in self._rules}
+        transitions = []
+        for alert_id, alert in list(self._alerts.items()):
+            rule = rules.get(alert['rule'])
+            if rule is None:
+                del self._alerts[alert_id] # The rule was removed from the configuration
+                continue
+            if alert['state'] == 'pending':
+                if not alert['holds']:
+                    del self._alerts[alert_id]
+                elif now - alert['started_at'] >= rule.for_seconds:
+                    alert['state'] = 'firing'
+                    alert['fired_at'] = now
+                    transitions.append(dict(alert))
+            elif alert['holds']:
+                alert['cleared_at'] = None
+            else:
+                # Hold-down: a firing alert resolves only after staying clear for a while
+                if alert['cleared_at'] is None:
+                    alert['cleared_at'] = now
+                hold_down = rule.resolve_after_seconds
+                if hold_down is None:
+                    hold_down = settings.alert_hold_down_seconds
+                if now - alert['cleared_at'] >= hold_down:
+                    alert['state'] = 'resolved'
+                    alert['resolved_at'] = now
+                    del self._alerts[alert_id]
+                    self._resolved.insert(0, alert)
+                    transitions.append(dict(alert))
+        del self._resolved[settings.alert_history_size:]
+        return transitions
+
+    async def _notify(self, transitions: list[dict]):
+        settings = get_settings()
+        if settings.alert_file_path:
+            try:
+                with open(settings.alert_file_path, 'a') as sink:
+                    for alert in transitions:
+                        sink.write(json.dumps(alert) + "\n")
+            except OSError as e:
+                print(f"Warning: Could not write alerts to '{settings.alert_file_path}': {e}")
+        if settings.alert_webhook_url:
+            try:
+                await asyncio.to_thread(_post_json, settings.alert_webhook_url, {'alerts': transitions})
+            except Exception as e:
+                print(f"Warning: Could not deliver alerts to the webhook: {e}")
+
+    async def evaluate(self, store):
+        """
+        Collector tick callback: evaluates the rules of every snapshot that changed,
+        advances pending and firing alerts, notifies the sinks of transitions and
+        stores the alert state.
+        """
+        settings = get_settings()
+        self.get_rules()
+        if self._alerts is None:
+            self._load(store)
+        now = time.time()
+
+        for source in self._rules_by_source:
+            snapshot = store.get(source, settings.snapshot_max_age_seconds)
+            if snapshot is None or self._versions.get(source) == snapshot[1]:
+                continue
+            self._versions[source] = snapshot[1]
+            series = {}
+            flatten_metrics(snapshot[0], source, series)
+            self._evaluate_source(source, series, now)
+
+        transitions = self._advance(now)
+        if transitions:
+            await self._notify(transitions)
+
+        alerts = sorted(self._alerts.values(), key=lambda alert: alert['started_at'])
+        store.put('alerts', {
+            'evaluated_at': now,
+            'rules': len(self._rules),
+            'firing': [alert for alert in alerts if alert['state'] == 'firing'],
+            'pending': [alert for alert in alerts if alert['state'] == 'pending'],
+            'resolved': self._resolved,
+        })
+
+
+alert_engine = AlertEngine()
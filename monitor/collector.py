@@ -0,0 +1,302 @@
+# monitor/collector.py
+import asyncio
+import fcntl
+import json
+import os
+import sqlite3
+import time
+
+import asyncpg
+
+from monitor.settings import get_settings
+
+
+class SnapshotStore:
+    """
+    A small SQLite file shared by every worker on the host. The elected collector
+    writes sampled results into it and every worker serves reads from it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Snapshots may contain connection strings, keep the file private
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def put(self, key: str, value):
+        self._connection().execute(
+            "INSERT INTO snapshots (key, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (key, json.dumps(value), time.time()),
+        )
+
+    def get(self, key: str, max_age: float = None):
+        """
+        Returns (value, updated_at) for key, or None if it is missing or older than max_age seconds.
+        """
+        row = self._connection().execute(
+            "SELECT value, updated_at FROM snapshots WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, updated_at = row
+        if max_age is not None and time.time() - updated_at > max_age:
+            return None
+        return json.loads(value), updated_at
+
+    def prune(self, prefix: str, max_age: float):
+        """
+        Deletes the entries whose key starts with prefix and that are older than max_age seconds.
+        """
+        self._connection().execute(
+            "DELETE FROM snapshots WHERE substr(key, 1, ?) = ? AND updated_at < ?",
+            (len(prefix), prefix, time.time() - max_age),
+        )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CollectorLease:
+    """
+    Decides which worker runs collection. With lock='file' the holder of an exclusive
+    flock on collector_lock_path wins; with lock='advisory' the holder of a Postgres
+    session advisory lock on the primary wins. The lease is kept until release() or
+    process exit, and losers retry on every tick so a replacement takes over when
+    the collector dies.
+
+    In advisory mode every worker keeps one dedicated connection, outside the pools
+    (pooled connections run pg_advisory_unlock_all() when they are released). Losers
+    retry on it, and the holder checks it on every tick, dropping the lease if its
+    backend went away, since the server released the lock with it.
+    """
+
+    def __init__(self, lock: str):
+        self.lock = lock
+        self._file = None
+        self._conn = None
+        self._locked = False
+
+    @property
+    def held(self) -> bool:
+        if self._file is not None:
+            return True
+        return self._locked and self._conn is not None and not self._conn.is_closed()
+
+    async def try_acquire(self) -> bool:
+        if self.lock == 'advisory':
+            return await self._try_advisory_lock()
+        if self.held:
+            return True
+        return self._try_file_lock()
+
+    def _try_file_lock(self) -> bool:
+        lock_file = open(get_settings().collector_lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    async def _try_advisory_lock(self) -> bool:
+        settings = get_settings()
+        try:
+            if self._conn is None or self._conn.is_closed():
+                if self._locked:
+                    print(f"Warning: Worker {os.getpid()} lost its collector lock connection.")
+                self._locked = False
+                self._conn = await asyncpg.connect(
+                    settings.conn_string('postgres'),
+                    server_settings={'application_name': f"{settings.application_name}_collector"},
+                )
+            if self._locked:
+                await self._conn.fetchval("SELECT 1;") # Fails if the backend was terminated
+            else:
+                self._locked = await self._conn.fetchval(
+                    "SELECT pg_try_advisory_lock($1);", settings.collector_advisory_lock_key
+                )
+            return self._locked
+        except (asyncpg.exceptions.PostgresError, asyncpg.exceptions.InterfaceError, OSError) as e:
+            if self._locked:
+                print(f"Warning: Worker {os.getpid()} lost the collector lock: {e}")
+            else:
+                print(f"Warning: Could not try the collector lock: {e}")
+            self._locked = False
+            await self._close_connection()
+            return False
+
+    async def _close_connection(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close(timeout=5)
+            except Exception:
+                self._conn.terminate()
+            self._conn = None
+
+    async def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._locked = False
+        await self._close_connection()
+
+
+class Collector:
+    """
+    Runs registered samplers on the elected worker and stores their results in the
+    snapshot store under the sampler name. Every other worker only reads snapshots.
+    """
+
+    def __init__(self):
+        self.samplers = {}  # name -> (async callable, interval seconds)
+        self.tick_callbacks = []  # async callables run after every tick, on the collector only
+        self.last_run = {}  # name -> monotonic time of the last run
+        self.lease = None
+        self.store = None
+        self._task = None
+
+    def register_sampler(self, name: str, func, interval_seconds: float = None):
+        """
+        Registers an async callable whose result is stored under name. It runs on the
+        collector every interval_seconds (default: collect_interval_seconds).
+        """
+        self.samplers[name] = (func, interval_seconds)
+
+    def on_tick(self, callback):
+        """
+        Registers an async callable run with the snapshot store after every collection tick.
+        """
+        self.tick_callbacks.append(callback)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lease is not None and self.lease.held
+
+    def get_store(self) -> SnapshotStore:
+        if self.store is None:
+            self.store = SnapshotStore(get_settings().snapshot_store_path)
+        return self.store
+
+    async def tick(self):
+        settings = get_settings()
+        store = self.get_store()
+        now = time.monotonic()
+        for name, (func, interval_seconds) in self.samplers.items():
+            interval_seconds = interval_seconds or settings.collect_interval_seconds
+            if now - self.last_run.get(name, float('-inf')) < interval_seconds:
+                continue
+            self.last_run[name] = now
+            try:
+                store.put(name, await func())
+            except Exception as e:
+                print(f"Warning: Sampler '{name}' failed: {e}")
+
+        for callback in self.tick_callbacks:
+            try:
+                await callback(store)
+            except Exception as e:
+                print(f"Warning: Collector tick callback failed: {e}")
+
+    async def _run(self):
+        settings = get_settings()
+        while True:
+            try:
+                was_leader = self.is_leader
+                if await self.lease.try_acquire():
+                    if not was_leader:
+                        print(f"Worker {os.getpid()} elected collector.")
+                    await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: Collector election or tick failed: {e}")
+            await asyncio.sleep(settings.collector_tick_seconds)
+
+    def start(self):
+        settings = get_settings()
+        if not settings.collector_enabled or self._task is not None:
+            return
+        self.lease = CollectorLease(settings.collector_lock)
+        self._task = asyncio.create_task(self._run())
+        print(f"Collector election started in worker {os.getpid()} (lock: {settings.collector_lock}).")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.lease is not None:
+            await self.lease.release()
+        if self.store is not None:
+            self.store.close()
+
+
+collector = Collector()
+
+
+def sample_rates(key: str, values: dict, min_interval_seconds: float,
+                 allow_negative: bool = False) -> dict:
+    """
+    Returns name -> change per second of each value since the previous sample stored
+    under key, then stores values as the new sample. Samples closer together than
+    min_interval_seconds are not stored, so frequent callers do not shrink the
+    measurement window to nothing. Decreases get no rate unless allow_negative is set.
+
+    Args:
+        key: Snapshot store key holding the previous sample.
+        values: name -> current numeric value.
+        min_interval_seconds: Minimum age of the previous sample before it is replaced.
+        allow_negative: Whether a decrease yields a negative rate instead of none.
+    """
+    store = collector.get_store()
+    previous = store.get(key)
+    now = time.time()
+
+    rates = {}
+    if previous is not None:
+        previous_values, previous_at = previous
+        elapsed = now - previous_at
+        if elapsed > 0:
+            for name, value in values.items():
+                before = previous_values.get(name)
+                if value is None or before is None or (value < before and not allow_negative):
+                    continue
+                rates[name] = (value - before) / elapsed
+
+    if previous is None or now - previous[1] >= min_interval_seconds:
+        store.put(key, values)
+    return rates
+
+
+def get_snapshot(key: str, max_age: float = None):
+    """
+    Returns the stored snapshot value for key, or None if there is none fresher than
+    max_age seconds (default: snapshot_max_age_seconds).
+    """
+    if max_age is None:
+        max_age = get_settings().snapshot_max_age_seconds
+    try:
+        snapshot = collector.get_store().get(key, max_age)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not read snapshot '{key}': {e}")
+        return None
+    return snapshot[0] if snapshot else None
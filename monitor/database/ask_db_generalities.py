@@ -1,9 +1,11 @@
 # database/ask_db_generalities.py
 import asyncpg
-import os
-import asyncio
 
-from monitor.constants import *
+from monitor.admission import AdmissionRejected
+from monitor.database.connection import connect
+from monitor.database.queries import catalog_request, run_query
+from monitor.database.routing import primary_conn_string, read_base_conn_string, read_conn_string
+from monitor.settings import get_settings
 
 
 async def print_all_databases_and_tables():
@@ -13,22 +15,21 @@ async def print_all_databases_and_tables():
     """
 
     # Check if the variables loaded from .env are not None
-    if not all([USER, PASSWORD, HOST, PORT]):
+    settings = get_settings()
+    if not all([settings.user, settings.password, settings.host, settings.port]):
         print("Error: Missing one or more database connection parameters in .env file.")
         return
 
-    # Construct the base connection string for the admin database (e.g., 'postgres')
-    # Use the variables that were loaded from the .env file
-    admin_conn_string = (
-        f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/postgres"
-    )
+    # Catalog discovery is read-only, so it goes to the least-lagged healthy replica
+    read_base = await read_base_conn_string()
+    admin_conn_string = f"{read_base}/postgres"
 
     print("--- Discovering Databases ---")
     try:
         # Query to get all non-template database names
-        db_names = await open_async_request(
+        db_names = await catalog_request(
             admin_conn_string,
-            "SELECT datname FROM pg_database WHERE datistemplate = false AND datname NOT IN ('postgres', 'template0', 'template1');",
+            'list_databases',
             fetch_as_dict=True
         )
         
@@ -43,16 +44,13 @@ async def print_all_databases_and_tables():
             print(f"\n--- Processing Database: {db_name} ---")
 
             # Construct the connection string for the current database
-            # Use the variables that were loaded from the .env file
-            current_db_conn_string = (
-                f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{db_name}"
-            )
+            current_db_conn_string = f"{read_base}/{db_name}"
 
             try:
                 # Query to get all tables in the 'public' schema for the current database
-                tables = await open_async_request(
+                tables = await catalog_request(
                     current_db_conn_string,
-                    "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public';",
+                    'list_public_tables',
                     fetch_as_dict=True
                 )
 
@@ -63,9 +61,13 @@ async def print_all_databases_and_tables():
                 else:
                     print(f"No tables found in '{db_name}' (public schema).")
 
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 print(f"  Error accessing tables in database '{db_name}': {e}")
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error discovering databases: {e}")
 
@@ -82,19 +84,19 @@ async def get_db_connection_strings_and_tables_dict() -> dict:
     """
     db_structure_with_conn_info = {}
 
-    if not all([USER, PASSWORD, HOST, PORT]):
+    settings = get_settings()
+    if not all([settings.user, settings.password, settings.host, settings.port]):
         print("Error: Missing one or more database connection parameters in .env file. Cannot fetch database structure.")
         return db_structure_with_conn_info
 
-    admin_conn_string = (
-        f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/postgres"
-    )
+    read_base = await read_base_conn_string()
+    admin_conn_string = f"{read_base}/postgres"
 
     try:
         # Get all non-template database names
-        db_names = await open_async_request(
+        db_names = await catalog_request(
             admin_conn_string,
-            "SELECT datname FROM pg_database WHERE datistemplate = false AND datname NOT IN ('postgres', 'template0', 'template1');",
+            'list_databases',
             fetch_as_dict=True
         )
         
@@ -104,40 +106,27 @@ async def get_db_connection_strings_and_tables_dict() -> dict:
 
         for db_info in db_names:
             db_name = db_info['datname']
-            # Construct the full connection string for the current database
-            current_db_conn_string = (
-                f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{db_name}"
-            )
+            # The reported 'conn' is the primary; the catalog queries go to the read endpoint
+            current_db_conn_string = primary_conn_string(db_name)
+            read_db_conn_string = f"{read_base}/{db_name}"
 
             tables_info = {} # This will be the dictionary for tables
             try:
-                # First, get all table names in the 'public' schema for the current database
-                tables_data = await open_async_request(
-                    current_db_conn_string,
-                    "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public';",
+                # All public tables and their columns in a single catalog query
+                columns_data = await catalog_request(
+                    read_db_conn_string,
+                    'list_public_table_columns',
                     fetch_as_dict=True
                 )
-                
-                # For each table, get its column names
-                for table_row in tables_data:
-                    table_name = table_row['table_name']
-                    column_names_list = []
-                    try:
-                        columns_data = await open_async_request(
-                            current_db_conn_string,
-                            "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = $1 ORDER BY ordinal_position;",
-                            params=(table_name,), # Pass table_name as a tuple parameter
-                            fetch_as_dict=True
-                        )
-                        column_names_list = [col['column_name'] for col in columns_data]
-                    except Exception as col_e:
-                        print(f"Warning: Could not access columns for table '{table_name}' in database '{db_name}': {col_e}")
-                    
-                    tables_info[table_name] = column_names_list
+                for col in columns_data:
+                    column_names_list = tables_info.setdefault(col['table_name'], [])
+                    if col['column_name'] is not None:
+                        column_names_list.append(col['column_name'])
 
+            except AdmissionRejected:
+                raise
             except Exception as e:
-                print(f"Warning: Could not access tables for database '{db_name}' using connection string '{current_db_conn_string}': {e}")
-                # tables_info remains empty or partially filled if an error occurs
+                print(f"Warning: Could not access tables for database '{db_name}': {e}")
 
             # Populate the dictionary with the new structure
             db_structure_with_conn_info[db_name] = {
@@ -145,6 +134,8 @@ async def get_db_connection_strings_and_tables_dict() -> dict:
                 'tables': tables_info # Now a dictionary of table_name -> [column_names]
             }
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error building database connection string structure: {e}")
 
@@ -158,20 +149,19 @@ async def get_dbs_general_size() -> dict:
         A dictionary with a single key 'total_size_gb' and its value,
         or an empty dictionary if an error occurs.
     """
-    if not all([USER, PASSWORD, HOST, PORT]):
+    settings = get_settings()
+    if not all([settings.user, settings.password, settings.host, settings.port]):
         print("Error: Missing one or more database connection parameters in .env file. Cannot fetch general size.")
         return {}
 
-    admin_conn_string = (
-        f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/postgres"
-    )
+    admin_conn_string = await read_conn_string('postgres')
 
     total_size_bytes = 0
     try:
         # Get all non-template database names
-        db_names = await open_async_request(
+        db_names = await catalog_request(
             admin_conn_string,
-            "SELECT datname FROM pg_database WHERE datistemplate = false AND datname NOT IN ('postgres', 'template0', 'template1');",
+            'list_databases',
             fetch_as_dict=True
         )
         
@@ -183,17 +173,21 @@ async def get_dbs_general_size() -> dict:
             db_name = db_info['datname']
             try:
                 # Query the size of each database in bytes
-                size_bytes_result = await open_async_request(
+                size_bytes_result = await catalog_request(
                     admin_conn_string, # Can query pg_database_size from any database, but admin is fine
-                    "SELECT pg_database_size($1);",
+                    'database_size',
                     params=(db_name,),
                     fetch_as_dict=False # Returns a single value
                 )
                 if size_bytes_result and size_bytes_result[0] is not None:
                     total_size_bytes += size_bytes_result[0][0] # size_bytes_result is a list of lists/tuples
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 print(f"Warning: Could not get size for database '{db_name}': {e}")
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error calculating general database size: {e}")
         return {}
@@ -203,31 +197,31 @@ async def get_dbs_general_size() -> dict:
     return  f"{total_size_gb} GB"
 
 
-async def get_one_db_size(db_name: str) -> dict:
+async def get_one_db_size(db_name: str, fresh: bool = False) -> dict:
     """
     Returns the size of a specific database in gigabytes (GB) with 2 decimal places.
 
     Args:
         db_name: The name of the database to get the size for.
+        fresh: If True, ask the primary instead of a read replica.
 
     Returns:
         A dictionary with a single key 'size_gb' and its value,
         or an empty dictionary if an error occurs or database not found.
     """
-    if not all([USER, PASSWORD, HOST, PORT]):
+    settings = get_settings()
+    if not all([settings.user, settings.password, settings.host, settings.port]):
         print("Error: Missing one or more database connection parameters in .env file. Cannot fetch database size.")
         return {}
 
     # Construct the connection string for the specific database
-    specific_db_conn_string = (
-        f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{db_name}"
-    )
+    specific_db_conn_string = await read_conn_string(db_name, fresh)
 
     try:
         # Query the size of the current database in bytes
-        size_bytes_result = await open_async_request(
+        size_bytes_result = await catalog_request(
             specific_db_conn_string,
-            "SELECT pg_database_size(current_database());",
+            'current_database_size',
             fetch_as_dict=False # Returns a single value
         )
         
@@ -240,30 +234,32 @@ async def get_one_db_size(db_name: str) -> dict:
         else:
             print(f"Warning: Database '{db_name}' not found or size could not be retrieved.")
             return {}
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error getting size for database '{db_name}': {e}")
         return {}
 
 
-async def get_table_size(db_name: str, table_name: str) -> float | None:
+async def get_table_size(db_name: str, table_name: str, fresh: bool = False) -> float | None:
     """
     Connects to a specified PostgreSQL database and returns the total size of a given table
-    (including indexes and TOAST data) in megabytes.
+    (including indexes and TOAST data) in megabytes. For a partitioned table the size of
+    every partition is included.
 
     Args:
         db_name (str): The name of the database to connect to.
         table_name (str): The name of the table whose size is to be retrieved.
+        fresh (bool): If True, ask the primary instead of a read replica.
 
     Returns:
         float | None: The size of the table in megabytes, or None if the table
                       or database is not found, or an error occurs.
     """
-    conn = None
     try:
-        conn_string = f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{db_name}"
-        conn = await asyncpg.connect(conn_string)
-        query = f"SELECT pg_total_relation_size('{table_name}');"
-        size_bytes = await conn.fetchval(query)
+        conn_string = await read_conn_string(db_name, fresh)
+        async with connect(conn_string) as conn:
+            size_bytes = await run_query(conn, 'table_total_size', table_name, method='fetchval')
         if size_bytes is None:
             print(f"Warning: Table '{table_name}' not found in database '{db_name}' or size could not be retrieved.")
             return None
@@ -271,12 +267,52 @@ async def get_table_size(db_name: str, table_name: str) -> float | None:
             size_gb = size_bytes / (1024 * 1024 * 1024)
             return f"{size_gb:.3f} GB"
 
+    except AdmissionRejected:
+        raise
     except asyncpg.exceptions.PostgresError as e:
         print(f"A PostgreSQL specific error occurred: {e}")
         return None
     except Exception as e:
         print(f"An unexpected error occurred while fetching table size for '{table_name}' in '{db_name}': {e}")
         return None
-    finally:
-        if conn:
-            await conn.close()
\ No newline at end of file
+
+
+async def get_table_partitions(db_name: str, table_name: str, fresh: bool = False) -> dict | None:
+    """
+    Returns the size and row estimate of a table rolled up over its partition hierarchy,
+    together with the per-partition breakdown, from a single catalog query.
+    A table that is not partitioned is reported as its own single partition.
+
+    Args:
+        db_name (str): The name of the database to connect to.
+        table_name (str): The name of the (parent) table.
+        fresh (bool): If True, ask the primary instead of a read replica.
+
+    Returns:
+        dict | None: A dictionary with the rolled-up 'size_bytes', 'size_gb', 'row_estimate'
+                     and the 'partitions' list, or None if an error occurs.
+    """
+    try:
+        conn_string = await read_conn_string(db_name, fresh)
+        async with connect(conn_string) as conn:
+            tree = await run_query(conn, 'partition_tree', table_name)
+
+        partitions = [dict(row) for row in tree]
+        size_bytes = sum(partition['size_bytes'] for partition in partitions)
+        return {
+            'table': table_name,
+            'partitioned': len(partitions) > 1,
+            'size_bytes': size_bytes,
+            'size_gb': round(size_bytes / (1024 ** 3), 3),
+            'row_estimate': sum(partition['row_estimate'] for partition in partitions),
+            'partitions': partitions,
+        }
+
+    except AdmissionRejected:
+        raise
+    except asyncpg.exceptions.PostgresError as e:
+        print(f"A PostgreSQL specific error occurred: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while fetching partitions for '{table_name}' in '{db_name}': {e}")
+        return None
@@ -0,0 +1,162 @@
+# database/ask_db_maintenance.py
+import asyncpg
+
+from monitor.admission import AdmissionRejected
+from monitor.collector import sample_rates
+from monitor.database.connection import connect
+from monitor.database.queries import catalog_request, run_query
+from monitor.database.routing import primary_conn_string
+from monitor.settings import get_settings
+
+# Transaction IDs available before wraparound.
+XID_WRAPAROUND_LIMIT = 2 ** 31
+
+
+def _reloptions(reloptions) -> dict:
+    """
+    Turns a pg_class.reloptions array like ['autovacuum_vacuum_scale_factor=0.01'] into a dict.
+    """
+    options = {}
+    for option in reloptions or []:
+        name, _, value = option.partition('=')
+        options[name] = value
+    return options
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+async def table_maintenance(db_name: str) -> dict | None:
+    """
+    Connects to a specified PostgreSQL database and reports vacuum/analyze state for
+    every user table: dead tuples and their growth rate, time left until autovacuum
+    triggers (honouring per-table reloptions), running vacuum/analyze progress and
+    transaction ID freeze age. Tables are ranked by risk, highest first.
+
+    Statistics and progress views are local to the server, so this always runs on the primary.
+
+    Args:
+        db_name (str): The name of the database to inspect.
+
+    Returns:
+        dict | None: A dictionary with database-level freeze age and the ranked 'tables'
+                     list, or None if the database does not exist or an error occurs.
+    """
+    try:
+        async with connect(primary_conn_string(db_name)) as conn:
+            rows = await run_query(conn, 'table_maintenance')
+        if not rows:
+            print(f"Warning: Could not read maintenance statistics for database '{db_name}'.")
+            return None
+
+        datfrozenxid_age = rows[0]['datfrozenxid_age']
+        rows = [row for row in rows if row['relid'] is not None]
+        settings = get_settings()
+        # Dead tuples per second since the previous sample. Tables whose dead tuples
+        # went down (vacuumed in between) get no rate.
+        rates = sample_rates(
+            f"maintenance_samples:{db_name}",
+            {str(row['relid']): row['n_dead_tup'] for row in rows},
+            settings.maintenance_min_sample_seconds,
+        )
+        risk_threshold = settings.maintenance_risk_threshold
+
+        tables = []
+        for row in rows:
+            options = _reloptions(row['reloptions'])
+            autovacuum_enabled = options.get('autovacuum_enabled', 'true').lower() not in ('false', 'off', '0')
+            vacuum_threshold = float(options.get('autovacuum_vacuum_threshold', row['vacuum_threshold']))
+            vacuum_scale_factor = float(options.get('autovacuum_vacuum_scale_factor', row['vacuum_scale_factor']))
+            freeze_max_age = float(options.get('autovacuum_freeze_max_age', row['freeze_max_age']))
+
+            # reltuples is -1 for tables that were never vacuumed or analyzed
+            reltuples = max(row['reltuples'], 0)
+            autovacuum_threshold = vacuum_threshold + vacuum_scale_factor * reltuples
+            dead_tuples_to_threshold = max(autovacuum_threshold - row['n_dead_tup'], 0)
+
+            # With autovacuum_enabled=false only anti-wraparound vacuums still run
+            rate = rates.get(str(row['relid']))
+            if not autovacuum_enabled:
+                seconds_to_autovacuum = None
+            elif dead_tuples_to_threshold == 0:
+                seconds_to_autovacuum = 0.0
+            elif rate:
+                seconds_to_autovacuum = dead_tuples_to_threshold / rate
+            else:
+                seconds_to_autovacuum = None
+
+            vacuum_pressure = row['n_dead_tup'] / autovacuum_threshold if autovacuum_threshold else 0.0
+            # xid_age is NULL for relations without a relfrozenxid
+            freeze_pressure = row['xid_age'] / freeze_max_age if freeze_max_age and row['xid_age'] is not None else 0.0
+            risk = max(vacuum_pressure, freeze_pressure)
+
+            vacuum_progress = None
+            if row['vacuum_phase'] is not None:
+                total = row['vacuum_heap_blks_total'] or 0
+                vacuum_progress = {
+                    'phase': row['vacuum_phase'],
+                    'pct_vacuumed': round(100 * row['vacuum_heap_blks_vacuumed'] / total, 1) if total else None,
+                }
+            analyze_progress = None
+            if row['analyze_phase'] is not None:
+                total = row['analyze_sample_blks_total'] or 0
+                analyze_progress = {
+                    'phase': row['analyze_phase'],
+                    'pct_sampled': round(100 * row['analyze_sample_blks_scanned'] / total, 1) if total else None,
+                }
+
+            tables.append({
+                'table': f"{row['schemaname']}.{row['relname']}",
+                'size_bytes': row['size_bytes'],
+                'n_live_tup': row['n_live_tup'],
+                'n_dead_tup': row['n_dead_tup'],
+                'n_mod_since_analyze': row['n_mod_since_analyze'],
+                'dead_tuples_per_second': round(rate, 3) if rate is not None else None,
+                'autovacuum_enabled': autovacuum_enabled,
+                'autovacuum_threshold': round(autovacuum_threshold),
+                'seconds_to_autovacuum': round(seconds_to_autovacuum, 1) if seconds_to_autovacuum is not None else None,
+                'last_vacuum': _isoformat(row['last_vacuum']),
+                'last_autovacuum': _isoformat(row['last_autovacuum']),
+                'last_analyze': _isoformat(row['last_analyze']),
+                'last_autoanalyze': _isoformat(row['last_autoanalyze']),
+                'vacuum_count': row['vacuum_count'],
+                'autovacuum_count': row['autovacuum_count'],
+                'analyze_count': row['analyze_count'],
+                'autoanalyze_count': row['autoanalyze_count'],
+                'xid_age': row['xid_age'],
+                'freeze_max_age': int(freeze_max_age),
+                'vacuum_in_progress': vacuum_progress,
+                'analyze_in_progress': analyze_progress,
+                'risk': round(risk, 3),
+                'at_risk': risk >= risk_threshold,
+            })
+
+        tables.sort(key=lambda table: table['risk'], reverse=True)
+        return {
+            'database': db_name,
+            'datfrozenxid_age': datfrozenxid_age,
+            'wraparound_pct': round(100 * datfrozenxid_age / XID_WRAPAROUND_LIMIT, 2),
+            'tables_at_risk': sum(1 for table in tables if table['at_risk']),
+            'tables': tables,
+        }
+
+    except AdmissionRejected:
+        raise
+    except asyncpg.exceptions.InvalidCatalogNameError:
+        print(f"Error: Database '{db_name}' does not exist. Please verify the database name.")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in table_maintenance for '{db_name}': {e}")
+        return None
+
+
+async def all_databases_maintenance() -> dict:
+    """
+    Runs table_maintenance for every user-defined database.
+
+    Returns:
+        A dictionary of database name -> table_maintenance report.
+    """
+    db_names = await catalog_request(primary_conn_string('postgres'), 'list_databases')
+    return {row['datname']: await table_maintenance(row['datname']) for row in db_names}
@@ -0,0 +1,316 @@
+# database/ask_db_plans.py
+import hashlib
+import json
+import time
+
+import asyncpg
+
+from monitor.admission import AdmissionRejected
+from monitor.collector import collector
+from monitor.database.connection import connect
+from monitor.database.queries import run_query
+from monitor.database.routing import primary_conn_string, read_conn_string
+from monitor.settings import get_settings
+
+# Name of the session prepared statement used to plan queries with $n placeholders.
+_EXPLAIN_STATEMENT = 'psql_monitor_explain'
+
+# A node whose actual rows are this many times off the estimate is flagged.
+MISESTIMATE_FACTOR = 10
+
+
+def _normalize_query(sql: str) -> str:
+    """
+    Collapses whitespace and drops trailing semicolons, so trivially different
+    spellings of a query share a cache entry.
+    """
+    return ' '.join(sql.split()).rstrip(';').strip()
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1('\0'.join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+def _tracking_name(db_name: str, query: str, queryid: int = None) -> str:
+    return f"{db_name}:{queryid}" if queryid is not None else f"{db_name}:{_digest(query)}"
+
+
+def _plan_shape(node: dict) -> str:
+    """
+    Node types, relations and indexes of the plan tree, without costs or row counts.
+    """
+    target = node.get('Index Name') or node.get('Relation Name') or ''
+    children = ','.join(_plan_shape(child) for child in node.get('Plans', []))
+    return f"{node['Node Type']}[{target}]({children})"
+
+
+def _compact_plan(node: dict, analyze: bool) -> dict:
+    """
+    Reduces an EXPLAIN (FORMAT JSON) node to its type, target, cost and row figures,
+    adding the cost (and with ANALYZE, the time) spent in the node itself.
+    """
+    children = [_compact_plan(child, analyze) for child in node.get('Plans', [])]
+    entry = {'node': node['Node Type']}
+    for key, name in (('Relation Name', 'relation'), ('Index Name', 'index'),
+                      ('Join Type', 'join_type'), ('Parent Relationship', 'relationship')):
+        if key in node:
+            entry[name] = node[key]
+    entry['startup_cost'] = node['Startup Cost']
+    entry['total_cost'] = node['Total Cost']
+    entry['self_cost'] = round(max(node['Total Cost'] - sum(child['total_cost'] for child in children), 0), 2)
+    entry['plan_rows'] = node['Plan Rows']
+
+    if analyze and 'Actual Loops' in node:
+        loops = node['Actual Loops']
+        entry['actual_rows'] = node['Actual Rows']
+        entry['loops'] = loops
+        entry['total_ms'] = round(node['Actual Total Time'] * loops, 3)
+        entry['self_ms'] = round(max(entry['total_ms'] - sum(child.get('total_ms', 0) for child in children), 0), 3)
+        estimated, actual = max(node['Plan Rows'], 1), max(node['Actual Rows'], 1)
+        entry['misestimate'] = max(estimated / actual, actual / estimated) >= MISESTIMATE_FACTOR
+
+    if children:
+        entry['children'] = children
+    return entry
+
+
+def _mark_hot(entry: dict, whole: float, key: str, fraction: float, path: str, hot_nodes: list):
+    path = f"{path}/{entry['node']}" if path else entry['node']
+    entry['hot'] = bool(whole) and entry.get(key, 0) >= fraction * whole
+    if entry['hot']:
+        hot_nodes.append({
+            'path': path,
+            'relation': entry.get('relation'),
+            'index': entry.get('index'),
+            key: entry.get(key),
+        })
+    for child in entry.get('children', []):
+        _mark_hot(child, whole, key, fraction, path, hot_nodes)
+
+
+async def _explain(conn, sql: str, analyze: bool) -> tuple[dict, bool]:
+    """
+    Runs EXPLAIN in a read-only transaction under the explain statement timeout, so
+    ANALYZE cannot write to tables or run for long. Functions with side effects still
+    run, which is why callers only ANALYZE on a replica. Queries with $n placeholders,
+    such as pg_stat_statements texts, are prepared and explained with a forced generic
+    plan, which does not depend on parameter values.
+
+    Returns the top-level plan object and whether a generic plan was used.
+    """
+    settings = get_settings()
+    options = 'FORMAT JSON, ANALYZE, BUFFERS' if analyze else 'FORMAT JSON'
+    prepared = False
+    try:
+        async with conn.transaction(readonly=True):
+            await conn.execute(f"SET LOCAL statement_timeout = {int(settings.explain_statement_timeout_ms)}")
+            # Prepared outside the statement cache; the extended protocol also rejects
+            # several statements in one text.
+            statement = await conn.prepare(f"EXPLAIN ({options}) {sql}")
+            parameters = statement.get_parameters()
+            if not parameters:
+                return json.loads(await statement.fetchval())[0], False
+            if analyze:
+                raise ValueError("ANALYZE needs parameter values, the query has $n placeholders.")
+
+            await conn.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+            await (await conn.prepare(f"PREPARE {_EXPLAIN_STATEMENT} AS {sql}")).fetch()
+            prepared = True
+            nulls = ', '.join(['NULL'] * len(parameters))
+            explain = await conn.prepare(f"EXPLAIN (FORMAT JSON) EXECUTE {_EXPLAIN_STATEMENT}({nulls})")
+            return json.loads(await explain.fetchval())[0], True
+    finally:
+        # Session prepared statements survive the end of the transaction
+        if prepared:
+            await conn.execute(f"DEALLOCATE {_EXPLAIN_STATEMENT}")
+
+
+async def _schema_fingerprint(conn, db_name: str) -> str:
+    """
+    Returns the schema fingerprint of db_name, hashing the catalog at most once per
+    explain_fingerprint_seconds; in between the stored fingerprint is reused.
+    """
+    store = collector.get_store()
+    key = f"schema_fingerprint:{db_name}"
+    stored = store.get(key, get_settings().explain_fingerprint_seconds)
+    if stored is not None:
+        return stored[0]
+    fingerprint = await run_query(conn, 'schema_fingerprint', method='fetchval')
+    store.put(key, fingerprint)
+    return fingerprint
+
+
+def tracked_queries() -> dict:
+    """
+    Returns tracking name -> {'db_name', 'sql', 'queryid'} for the queries in the
+    explain_tracked_queries setting and those added with track=true.
+    """
+    tracked = {}
+    for spec in get_settings().explain_tracked_queries:
+        query = _normalize_query(spec.get('sql') or '')
+        name = _tracking_name(spec['db_name'], query, spec.get('queryid'))
+        tracked[name] = {'db_name': spec['db_name'], 'sql': query or None, 'queryid': spec.get('queryid')}
+    stored = collector.get_store().get('plan_tracked')
+    if stored:
+        tracked.update(stored[0])
+    return tracked
+
+
+def _track(name: str, db_name: str, sql: str, queryid: int):
+    store = collector.get_store()
+    stored = store.get('plan_tracked')
+    tracked = stored[0] if stored else {}
+    if name not in tracked:
+        tracked[name] = {'db_name': db_name, 'sql': sql if queryid is None else None, 'queryid': queryid}
+        store.put('plan_tracked', tracked)
+
+
+async def explain_query(db_name: str,
+                        sql: str = None,
+                        queryid: int = None,
+                        analyze: bool = False,
+                        fresh: bool = False,
+                        track: bool = False,
+                        use_cache: bool = True) -> dict | None:
+    """
+    Explains a query given as SQL text or as a pg_stat_statements queryid and returns
+    its plan as a compact tree with per-node cost, rows and (with ANALYZE) time, and
+    the hot nodes where most of the cost or time is spent.
+
+    Plans are cached by normalized query and schema fingerprint, so a schema change
+    invalidates them once the fingerprint is recomputed (explain_fingerprint_seconds). If the query is tracked, plan_changed tells whether its plan
+    shape differs from the last tracked sample.
+
+    Args:
+        db_name (str): The database to explain the query in.
+        sql (str): The query text. Ignored when queryid is given.
+        queryid (int): A pg_stat_statements queryid, whose text is read on the primary.
+        analyze (bool): If True, execute the query with EXPLAIN ANALYZE. Only allowed when
+                        the query is routed to a read replica.
+        fresh (bool): If True, plan on the primary and skip the cache.
+        track (bool): If True, add the query to the tracked queries.
+        use_cache (bool): If False, skip the cache.
+
+    Returns:
+        dict | None: The plan report, a dictionary with an 'error' message if the query
+                     could not be explained, or None if an unexpected error occurs.
+    """
+    settings = get_settings()
+    try:
+        if queryid is not None:
+            async with connect(primary_conn_string(db_name)) as conn:
+                sql = await run_query(conn, 'statement_text', queryid, method='fetchval')
+            if sql is None:
+                return {'error': f"queryid {queryid} not found in pg_stat_statements of database '{db_name}'."}
+        if not sql:
+            return {'error': "Either sql or queryid is required."}
+        query = _normalize_query(sql)
+        name = _tracking_name(db_name, query, queryid)
+        if track:
+            _track(name, db_name, query, queryid)
+
+        store = collector.get_store()
+        conn_string = await read_conn_string(db_name, fresh)
+        # A read-only transaction does not stop functions with side effects, such as
+        # pg_terminate_backend(), so user SQL is only ever executed on a replica
+        if analyze and conn_string == primary_conn_string(db_name):
+            reason = "fresh=true targets the primary" if fresh else "no healthy read replica is available"
+            return {'error': f"ANALYZE executes the query and only runs on a read replica, but {reason}."}
+        async with connect(conn_string) as conn:
+            fingerprint = await _schema_fingerprint(conn, db_name)
+            cache_key = f"plan:{db_name}:{_digest(query, fingerprint, analyze)}"
+            cached = store.get(cache_key, settings.explain_cache_seconds) if use_cache and not fresh else None
+            if cached is not None:
+                report = cached[0]
+                report['cached'] = True
+            else:
+                explained, generic = await _explain(conn, query, analyze)
+                report = None
+
+        if report is None:
+            plan = _compact_plan(explained['Plan'], analyze)
+            hot_key = 'self_ms' if analyze else 'self_cost'
+            whole = plan.get('total_ms') if analyze else plan['total_cost']
+            hot_nodes = []
+            _mark_hot(plan, whole, hot_key, settings.explain_hot_node_fraction, '', hot_nodes)
+            report = {
+                'db_name': db_name,
+                'query': query,
+                'queryid': queryid,
+                'tracking_name': name,
+                'analyze': analyze,
+                'generic_plan': generic,
+                'total_cost': plan['total_cost'],
+                'planning_ms': explained.get('Planning Time'),
+                'execution_ms': explained.get('Execution Time'),
+                'shape': _digest(_plan_shape(explained['Plan'])),
+                'schema_fingerprint': fingerprint,
+                'explained_at': time.time(),
+                'hot_nodes': hot_nodes,
+                'plan': plan,
+            }
+            store.put(cache_key, report)
+            report['cached'] = False
+
+        plans = store.get('plans')
+        sample = plans[0].get(name) if plans else None
+        report['plan_changed'] = sample['shape'] != report['shape'] if sample and sample.get('shape') else None
+        return report
+
+    except AdmissionRejected:
+        raise
+    except asyncpg.exceptions.InvalidCatalogNameError:
+        print(f"Error: Database '{db_name}' does not exist. Please verify the database name.")
+        return {'error': f"Database '{db_name}' does not exist."}
+    except asyncpg.exceptions.UndefinedTableError as e:
+        if queryid is not None and 'pg_stat_statements' in str(e):
+            return {'error': f"pg_stat_statements is not installed in database '{db_name}'."}
+        return {'error': str(e)}
+    except asyncpg.exceptions.QueryCanceledError:
+        return {'error': f"EXPLAIN exceeded the {settings.explain_statement_timeout_ms} ms statement timeout."}
+    except (asyncpg.exceptions.PostgresError, ValueError) as e:
+        return {'error': str(e)}
+    except Exception as e:
+        print(f"An unexpected error occurred in explain_query for database '{db_name}': {e}")
+        return None
+
+
+async def tracked_plans() -> dict:
+    """
+    Re-plans every tracked query and compares its plan shape with the previous sample.
+
+    Returns:
+        dict: Tracking name -> current shape and cost, the previous shape and cost when
+              the plan changed, and the running count of shape changes.
+    """
+    store = collector.get_store()
+    previous_sample = store.get('plans')
+    previous_plans = previous_sample[0] if previous_sample else {}
+    now = time.time()
+
+    plans = {}
+    for name, spec in tracked_queries().items():
+        previous = previous_plans.get(name, {})
+        report = await explain_query(spec['db_name'], spec.get('sql'), spec.get('queryid'), use_cache=False)
+        if report is None or 'error' in report:
+            plans[name] = {**previous, 'error': report['error'] if report else "Could not explain the query."}
+            continue
+
+        changed = bool(previous.get('shape')) and previous['shape'] != report['shape']
+        plans[name] = {
+            'db_name': spec['db_name'],
+            'query': report['query'],
+            'queryid': spec.get('queryid'),
+            'shape': report['shape'],
+            'total_cost': report['total_cost'],
+            'checked_at': now,
+            'plan_changed': changed,
+            'shape_changes': previous.get('shape_changes', 0) + int(changed),
+            'changed_at': now if changed else previous.get('changed_at'),
+            'previous_shape': previous['shape'] if changed else previous.get('previous_shape'),
+            'previous_total_cost': previous['total_cost'] if changed else previous.get('previous_total_cost'),
+            'error': None,
+        }
+
+    store.prune('plan:', get_settings().explain_cache_seconds)
+    return plans
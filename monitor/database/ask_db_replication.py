@@ -0,0 +1,102 @@
+# database/ask_db_replication.py
+import asyncpg
+
+from monitor.admission import AdmissionRejected
+from monitor.collector import sample_rates
+from monitor.database.connection import connect
+from monitor.database.queries import run_query
+from monitor.database.routing import primary_conn_string
+from monitor.settings import get_settings
+
+
+def _size_setting_bytes(value: str) -> int | None:
+    """
+    Converts a size GUC such as max_slot_wal_keep_size ('-1', '1024MB', '10GB') to bytes.
+    Returns None for -1 (unlimited).
+    """
+    units = {'kB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+    value = value.strip()
+    if value == '-1':
+        return None
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(value[:-len(unit)]) * factor
+    return int(value) * 1024 ** 2 # Unit-less values of this setting are megabytes
+
+
+def _seconds_until(remaining_bytes, rate) -> float | None:
+    if remaining_bytes is None or not rate or rate <= 0:
+        return None
+    return round(max(remaining_bytes, 0) / rate, 1)
+
+
+async def replication_status() -> dict | None:
+    """
+    Connects to the primary and reports replication health: per-standby write/flush/replay
+    lag in bytes and seconds, and the WAL retained by each replication slot.
+
+    Rates come from the difference with the previous sample: WAL generation, how fast
+    each standby catches up, and how fast each slot's retained WAL grows. From the slot
+    growth rate it projects when the slot hits its retention limit: safe_wal_size when
+    max_slot_wal_keep_size is set, otherwise wal_retention_budget_bytes if configured.
+    A stuck logical slot shows up as steadily growing retained_bytes with a finite
+    seconds_to_limit.
+
+    Returns:
+        dict | None: A dictionary with 'wal', 'standbys' and 'slots', or None if an error occurs.
+    """
+    try:
+        async with connect(primary_conn_string('postgres')) as conn:
+            wal = await run_query(conn, 'wal_position', method='fetchrow')
+            standbys = [dict(row) for row in await run_query(conn, 'replication_standbys')]
+            slots = [dict(row) for row in await run_query(conn, 'replication_slots')]
+
+        settings = get_settings()
+        values = {'wal_bytes': wal['wal_bytes']}
+        for standby in standbys:
+            values[f"standby:{standby['application_name']}:{standby['client_addr']}"] = standby['replay_lag_bytes']
+        for slot in slots:
+            values[f"slot:{slot['slot_name']}"] = slot['retained_bytes']
+        rates = sample_rates(
+            'replication_samples', values, settings.replication_min_sample_seconds, allow_negative=True
+        )
+
+        for standby in standbys:
+            rate = rates.get(f"standby:{standby['application_name']}:{standby['client_addr']}")
+            # Positive when the standby is catching up, negative when it falls behind
+            standby['catchup_bytes_per_second'] = round(-rate, 1) if rate is not None else None
+
+        keep_size_bytes = _size_setting_bytes(wal['max_slot_wal_keep_size'])
+        budget_bytes = settings.wal_retention_budget_bytes
+        for slot in slots:
+            rate = rates.get(f"slot:{slot['slot_name']}")
+            slot['retained_bytes_per_second'] = round(rate, 1) if rate is not None else None
+            if keep_size_bytes is not None and slot['safe_wal_size'] is not None:
+                remaining_bytes = slot['safe_wal_size']
+            elif budget_bytes is not None and slot['retained_bytes'] is not None:
+                remaining_bytes = budget_bytes - slot['retained_bytes']
+            else:
+                remaining_bytes = None
+            slot['remaining_bytes'] = remaining_bytes
+            slot['seconds_to_limit'] = _seconds_until(remaining_bytes, rate)
+
+        wal_rate = rates.get('wal_bytes')
+        return {
+            'wal': {
+                'wal_bytes': wal['wal_bytes'],
+                'wal_bytes_per_second': round(wal_rate, 1) if wal_rate is not None else None,
+                'max_slot_wal_keep_size_bytes': keep_size_bytes,
+                'retained_bytes_total': sum(slot['retained_bytes'] or 0 for slot in slots),
+            },
+            'standbys': standbys,
+            'slots': slots,
+        }
+
+    except AdmissionRejected:
+        raise
+    except asyncpg.exceptions.PostgresError as e:
+        print(f"A PostgreSQL specific error occurred while reading replication status: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in replication_status: {e}")
+        return None
@@ -0,0 +1,49 @@
+# database/ask_db_server.py
+import asyncpg
+
+from monitor.admission import AdmissionRejected
+from monitor.collector import sample_rates
+from monitor.database.connection import connect
+from monitor.database.queries import run_query
+from monitor.database.routing import primary_conn_string
+from monitor.settings import get_settings
+
+
+async def server_activity() -> dict | None:
+    """
+    Connects to the primary and reads server-wide activity with a single query: buffer
+    cache hit ratio, client connections, active and idle-in-transaction sessions, and
+    sessions waiting on a lock held by another session.
+
+    cache_hit_ratio covers the blocks read since the previous sample; until there is
+    one, or when no blocks were read in between, it is the ratio since the last
+    statistics reset.
+
+    Returns:
+        dict | None: A dictionary of server metrics, or None if an error occurs.
+    """
+    try:
+        async with connect(primary_conn_string('postgres')) as conn:
+            row = await run_query(conn, 'server_activity', method='fetchrow')
+
+        activity = dict(row)
+        # Half the sampling interval, so every sampler run replaces the previous sample
+        rates = sample_rates(
+            'server_samples',
+            {'blks_hit': activity['blks_hit'], 'blks_read': activity['blks_read']},
+            get_settings().server_sample_interval_seconds / 2,
+        )
+        hits, reads = rates.get('blks_hit'), rates.get('blks_read')
+        if hits is None or reads is None or hits + reads == 0:
+            hits, reads = activity['blks_hit'] or 0, activity['blks_read'] or 0
+        activity['cache_hit_ratio'] = round(hits / (hits + reads), 4) if hits + reads else None
+        return activity
+
+    except AdmissionRejected:
+        raise
+    except asyncpg.exceptions.PostgresError as e:
+        print(f"A PostgreSQL specific error occurred while reading server activity: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in server_activity: {e}")
+        return None
@@ -1,87 +1,128 @@
 # database/ask_db_tables.py
-import asyncpg
-import os
 import asyncio
-#from asyncpg.utils import quote_ident 
-from monitor.constants import *
+import json
 
-# database/ask_db_tables.py
 import asyncpg
-import os
-import asyncio
-# Removed: from asyncpg.utils import quote_ident # This import caused the ImportError
 
-# Import constants and the open_async_request function from monitor.constants
-from monitor.constants import BASE_DB_CONN_STRING, open_async_request
+from monitor.admission import AdmissionRejected
+from monitor.database.connection import connect
+from monitor.database.queries import invalidate_statements, run_query
+from monitor.database.routing import primary_conn_string, read_conn_string
+from monitor.settings import get_settings
+
+# Metrics the batch endpoint answers from one catalog query per database.
+# 'column_counts' needs a scan of each table.
+CATALOG_METRICS = ('size', 'row_estimate', 'column_estimates')
+BATCH_METRICS = CATALOG_METRICS + ('column_counts',)
+
+
+def _quote_ident(name: str) -> str:
+    """
+    Double-quotes an identifier, escaping embedded double quotes.
+    """
+    return '"' + name.replace('"', '""') + '"'
 
 
-async def table_columns_dict(db_name: str, table_name: str) -> dict | None:
+def _leaf_partitions(tree, partitions: list[str]) -> list[str]:
+    """
+    Expands partition names to the leaf partitions below them, without duplicates,
+    so a sub-partitioned range and a partition inside it are not counted twice.
+    """
+    children = {}
+    for row in tree:
+        children.setdefault(row['parent'], []).append(row)
+    leaves = {}
+    pending = [row for row in tree if row['partition'] in partitions]
+    while pending:
+        row = pending.pop()
+        if row['isleaf']:
+            leaves[row['partition']] = True
+        else:
+            pending.extend(children.get(row['partition'], []))
+    return sorted(leaves)
+
+
+async def table_columns_dict(db_name: str,
+                             table_name: str,
+                             fresh: bool = False,
+                             mode: str = 'exact',
+                             partitions: list[str] = None) -> dict | None:
     """
     Connects to a specified PostgreSQL database and retrieves a dictionary
     where keys are column names of a given table and values are the count
     of non-NULL items in each respective column.
 
+    Partitioned tables are handled as a whole: 'exact' mode counts every column in a
+    single scan of the table (which Postgres expands to its partitions), and
+    'estimate' mode rolls up the planner statistics of all leaf partitions without
+    scanning. Passing partitions restricts either mode to the leaf partitions below
+    the named ones, so only the requested range is read.
+
     Args:
         db_name (str): The name of the database to connect to.
         table_name (str): The name of the table to inspect.
+        fresh (bool): If True, count on the primary instead of a read replica.
+        mode (str): 'exact' to count with a table scan, 'estimate' to use pg_stats.
+        partitions (list[str]): Optional partition names, as listed by the partitions endpoint.
 
     Returns:
         dict | None: A dictionary with column names as keys and their non-NULL counts as values,
                      or None if the database/table does not exist or an error occurs.
     """
-    column_counts = {}
-    conn = None # Initialize connection to None
-
     try:
-        # Establish a single connection for all operations within this function
-        conn_string = f"{BASE_DB_CONN_STRING}/{db_name}"
-        conn = await asyncpg.connect(conn_string)
-
-        # First, get all column names for the specified table
-        # We query information_schema.columns to get metadata about the table's columns.
-        # Using parameterized query for table_schema and table_name (values)
-        columns_query = """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = $1
-            AND table_name = $2;
-        """
-        # Execute the query using the established connection
-        column_records = await conn.fetch(
-            columns_query,
-            'public', # Assuming 'public' schema, adjust if needed
-            table_name
-        )
-
-        if not column_records:
-            print(f"Warning: No columns found for table '{table_name}' in database '{db_name}'. "
-                  f"Table might not exist or is empty, or schema is not 'public'.")
-            return None
-
-        # Iterate through each column and get its non-NULL count
-        for col_record in column_records:
-            column_name = col_record['column_name']
-            
-            # Reverting to direct double-quoting for identifiers.
-            # This is the most reliable approach given asyncpg's internal structure.
-            # Identifiers (table and column names) are enclosed in double quotes.
-            # This is safe because column_name and table_name are derived from
-            # trusted database metadata (information_schema), not direct user input.
-            quoted_column_name = f'"{column_name}"'
-            quoted_table_name = f'"{table_name}"'
-            
-            count_query = f"SELECT COUNT({quoted_column_name}) FROM {quoted_table_name};"
-            
-            # Execute the count query using the established connection
-            count_result = await conn.fetchval(count_query)
-
-            if count_result is not None: # Check for None explicitly
-                column_counts[column_name] = count_result
+        # Establish a single connection for all operations within this function.
+        # Full-table counts are read-only, so they go to a replica unless fresh is set.
+        conn_string = await read_conn_string(db_name, fresh)
+        async with connect(conn_string) as conn:
+            quoted_table_name = _quote_ident(table_name)
+
+            if partitions:
+                tree = await run_query(conn, 'partition_tree', quoted_table_name)
+                unknown = set(partitions) - {row['partition'] for row in tree}
+                if unknown:
+                    print(f"Error: {sorted(unknown)} are not partitions of '{table_name}' in database '{db_name}'.")
+                    return None
+                partitions = _leaf_partitions(tree, partitions)
+
+            if mode == 'estimate':
+                estimates = await run_query(conn, 'column_non_null_estimates', quoted_table_name, partitions)
+                return {row['column_name']: row['non_null'] for row in estimates}
+
+            # First, get all column names for the specified table
+            # from information_schema.columns through the query catalog.
+            column_records = await run_query(
+                conn,
+                'list_table_columns',
+                'public', # Assuming 'public' schema, adjust if needed
+                table_name
+            )
+
+            if not column_records:
+                print(f"Warning: No columns found for table '{table_name}' in database '{db_name}'. "
+                      f"Table might not exist or is empty, or schema is not 'public'.")
+                return None
+
+            # Count every column in one scan. Identifiers come from trusted database
+            # metadata (information_schema, pg_partition_tree), not direct user input.
+            column_names = [record['column_name'] for record in column_records]
+            quoted_column_names = [_quote_ident(column_name) for column_name in column_names]
+            if partitions:
+                # Partition names come from regclass output and are already quoted where needed
+                selected_columns = ', '.join(quoted_column_names)
+                source = ' UNION ALL '.join(
+                    f"SELECT {selected_columns} FROM {partition}" for partition in partitions
+                )
+                source = f"({source}) AS selected_partitions"
             else:
-                column_counts[column_name] = 0 # Should not happen if table exists, but for safety
+                source = quoted_table_name
+
+            counts = ', '.join(f"COUNT({quoted_column_name})" for quoted_column_name in quoted_column_names)
+            count_row = await conn.fetchrow(f"SELECT {counts} FROM {source};")
 
-        return column_counts
+            return {column_name: count_row[i] or 0 for i, column_name in enumerate(column_names)}
 
+    except AdmissionRejected:
+        raise
     except asyncpg.exceptions.InvalidCatalogNameError:
         print(f"Error: Database '{db_name}' does not exist. Please verify the database name.")
         return None
@@ -91,9 +132,6 @@ async def table_columns_dict(db_name: str, table_name: str) -> dict | None:
     except Exception as e:
         print(f"An unexpected error occurred in table_columns_dict for '{table_name}' in '{db_name}': {e}")
         return None
-    finally:
-        if conn:
-            await conn.close() # Ensure the connection is closed
 
 async def delete_table_with_confirmation(db_name: str, table_name: str) -> bool:
     """
@@ -107,7 +145,6 @@ async def delete_table_with_confirmation(db_name: str, table_name: str) -> bool:
     Returns:
         bool: True if the table was successfully deleted, False otherwise.
     """
-    conn = None
     try:
         # # First confirmation
         # first_confirm = input(f"Are you sure you want to delete table '{table_name}' from database '{db_name}'? (yes/no): ").strip().lower()
@@ -121,23 +158,25 @@ async def delete_table_with_confirmation(db_name: str, table_name: str) -> bool:
         #     print("Table deletion cancelled by user (second confirmation failed).")
         #     return False
 
-        # Construct the full connection string for the specified database
-        conn_string = f"{BASE_DB_CONN_STRING}/{db_name}"
-        conn = await asyncpg.connect(conn_string)
-
-        # Use quote_ident for the table name to ensure it's properly handled in the SQL.
-        # Since we don't have a direct quote_ident utility, we'll use f-string with double quotes.
-        # This is safe as table_name is confirmed by the user and not direct untrusted input.
-        quoted_table_name = f'"{table_name}"'
+        # DDL always runs on the primary
+        conn_string = primary_conn_string(db_name)
+        async with connect(conn_string) as conn:
+            # Use quote_ident for the table name to ensure it's properly handled in the SQL.
+            # Since we don't have a direct quote_ident utility, we'll use f-string with double quotes.
+            # This is safe as table_name is confirmed by the user and not direct untrusted input.
+            quoted_table_name = f'"{table_name}"'
         
-        # SQL query to drop the table. CASCADE option can be added if needed: DROP TABLE {quoted_table_name} CASCADE;
-        drop_query = f"DROP TABLE {quoted_table_name};"
+            # SQL query to drop the table. CASCADE option can be added if needed: DROP TABLE {quoted_table_name} CASCADE;
+            drop_query = f"DROP TABLE {quoted_table_name};"
 
-        print(f"Attempting to delete table '{table_name}' from database '{db_name}'...")
-        await conn.execute(drop_query)
-        print(f"Table '{table_name}' successfully deleted from database '{db_name}'.")
-        return True
+            print(f"Attempting to delete table '{table_name}' from database '{db_name}'...")
+            await conn.execute(drop_query)
+            await invalidate_statements(conn)
+            print(f"Table '{table_name}' successfully deleted from database '{db_name}'.")
+            return True
 
+    except AdmissionRejected:
+        raise
     except asyncpg.exceptions.InvalidCatalogNameError:
         print(f"Error: Database '{db_name}' does not exist. Table deletion failed.")
         return False
@@ -150,7 +189,106 @@ async def delete_table_with_confirmation(db_name: str, table_name: str) -> bool:
     except Exception as e:
         print(f"An unexpected error occurred during table deletion for '{table_name}' in '{db_name}': {e}")
         return False
-    finally:
-        if conn:
-            await conn.close() # Ensure the connection is closed
 
+
+
+async def batch_table_stats(items: list[dict], fresh: bool = False) -> dict:
+    """
+    Answers many (database, table, metrics) items in one call. Items are grouped by
+    database and every catalog metric of a database comes from a single query over all
+    its tables; exact column counts scan each table. At most batch_max_parallel of these
+    queries run at once, and each still takes a slot of the global Postgres work budget.
+
+    A failing item does not fail the batch: it gets an 'errors' list instead.
+
+    Args:
+        items (list[dict]): Dictionaries with 'db_name', 'table_name' and 'metrics', a list of
+                            'size', 'row_estimate', 'column_estimates' and 'column_counts'.
+        fresh (bool): If True, ask the primary instead of a read replica.
+
+    Returns:
+        dict: "db_name/table_name" -> the requested metrics of that table.
+    """
+    semaphore = asyncio.Semaphore(get_settings().batch_max_parallel)
+    results = {}
+    requested = {}  # key -> set of metrics
+    by_database = {}  # db_name -> {table_name: key}
+    for item in items:
+        key = f"{item['db_name']}/{item['table_name']}"
+        results.setdefault(key, {'db_name': item['db_name'], 'table_name': item['table_name']})
+        requested.setdefault(key, set()).update(item['metrics'])
+        by_database.setdefault(item['db_name'], {})[item['table_name']] = key
+
+    def add_error(key, message):
+        results[key].setdefault('errors', []).append(message)
+
+    async def catalog_stats(db_name, tables):
+        table_names = [name for name, key in tables.items() if requested[key] & set(CATALOG_METRICS)]
+        if not table_names:
+            return
+        with_estimates = any('column_estimates' in requested[tables[name]] for name in table_names)
+        try:
+            async with semaphore:
+                conn_string = await read_conn_string(db_name, fresh)
+                async with connect(conn_string) as conn:
+                    try:
+                        rows = await run_query(conn, 'batch_table_stats', table_names, with_estimates)
+                    except asyncpg.exceptions.PostgresError:
+                        if len(table_names) == 1:
+                            raise
+                        # A malformed name (e.g. 'a.b.c.d') fails the whole query,
+                        # so ask for each name alone and fail only the bad items
+                        rows = []
+                        for name in table_names:
+                            try:
+                                rows.extend(await run_query(conn, 'batch_table_stats', [name], with_estimates))
+                            except asyncpg.exceptions.PostgresError as e:
+                                add_error(tables[name], f"Catalog query failed: {e}")
+        except asyncpg.exceptions.InvalidCatalogNameError:
+            print(f"Error: Database '{db_name}' does not exist. Please verify the database name.")
+            for name in table_names:
+                add_error(tables[name], f"Database '{db_name}' does not exist.")
+            return
+        except AdmissionRejected as e:
+            for name in table_names:
+                add_error(tables[name], str(e))
+            return
+        except Exception as e:
+            print(f"An unexpected error occurred in batch_table_stats for database '{db_name}': {e}")
+            for name in table_names:
+                add_error(tables[name], f"Catalog query failed: {e}")
+            return
+
+        for row in rows:
+            key = tables[row['table_name']]
+            if not row['found']:
+                add_error(key, f"Table '{row['table_name']}' does not exist in database '{db_name}'.")
+                continue
+            if 'size' in requested[key]:
+                results[key]['size_bytes'] = row['size_bytes']
+                results[key]['size_gb'] = round(row['size_bytes'] / (1024 ** 3), 3)
+            if 'row_estimate' in requested[key]:
+                results[key]['row_estimate'] = row['row_estimate']
+            if 'column_estimates' in requested[key]:
+                results[key]['column_estimates'] = json.loads(row['column_estimates'] or '{}')
+
+    async def column_counts(db_name, table_name, key):
+        try:
+            async with semaphore:
+                counts = await table_columns_dict(db_name, table_name, fresh, 'exact')
+        except AdmissionRejected as e:
+            add_error(key, str(e))
+            return
+        if counts is None:
+            add_error(key, f"Could not count the columns of '{table_name}' in database '{db_name}'.")
+        else:
+            results[key]['column_counts'] = counts
+
+    await asyncio.gather(*(catalog_stats(db_name, tables) for db_name, tables in by_database.items()))
+    # Tables the catalog query already reported as failed are not scanned
+    await asyncio.gather(*(
+        column_counts(results[key]['db_name'], results[key]['table_name'], key)
+        for key, metrics in requested.items()
+        if 'column_counts' in metrics and 'errors' not in results[key]
+    ))
+    return results
@@ -0,0 +1,215 @@
+# database/connection.py
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from monitor.admission import pg_work_slot
+from monitor.settings import get_settings
+
+# connection string -> asyncpg.Pool, created lazily on first use
+_pools = {}
+_pools_lock = asyncio.Lock()
+
+# connection string -> requests currently using its pool, and when it was last released
+_pool_users = {}
+_pool_last_used = {}
+
+# (connection string, backend pid) -> number of times a pooled connection with
+# that pid has been opened. Bumped whenever a pool opens a new connection, so
+# per-connection state keyed on it never outlives the backend it belongs to.
+# Entries are dropped when their connection closes.
+_connection_generations = {}
+
+# Callables run with the statement key of a pooled connection when it closes.
+_close_callbacks = []
+
+
+class PooledConnection:
+    """
+    A pooled asyncpg connection that also knows which connection string it came from.
+    Attribute access is forwarded to the underlying connection, so it can be used
+    wherever an asyncpg.Connection is expected.
+    """
+
+    def __init__(self, db_str: str, conn):
+        self.db_str = db_str
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def statement_key(self) -> tuple:
+        """
+        Identifies the server backend behind this connection, for per-connection caches.
+        """
+        pid = self._conn.get_server_pid()
+        return (self.db_str, pid, _connection_generations.get((self.db_str, pid), 0))
+
+
+def on_connection_closed(callback):
+    """
+    Registers a callable run with the statement key of every pooled connection that
+    closes, so per-connection state can be dropped with it.
+    """
+    _close_callbacks.append(callback)
+
+
+def _connection_closed(statement_key: tuple, conn):
+    db_str, pid, generation = statement_key
+    if _connection_generations.get((db_str, pid)) == generation:
+        del _connection_generations[(db_str, pid)]
+    for callback in _close_callbacks:
+        callback(statement_key)
+
+
+async def _init_connection(db_str: str, conn):
+    pid = conn.get_server_pid()
+    generation = _connection_generations.get((db_str, pid), 0) + 1
+    _connection_generations[(db_str, pid)] = generation
+    # The pid is captured now: it is no longer available once the connection is closed
+    conn.add_termination_listener(functools.partial(_connection_closed, (db_str, pid, generation)))
+
+
+async def get_pool(db_str: str):
+    """
+    Returns the connection pool for db_str, creating it on first use.
+
+    Pools keep no minimum number of connections and close connections that stay idle
+    for pg_pool_max_idle_seconds, so the monitor holds backends only while it works.
+    Cached statements live as long as their connection. In PgBouncer transaction-pooling
+    mode the asyncpg statement cache is disabled.
+    """
+    pool = _pools.get(db_str)
+    if pool is not None:
+        return pool
+
+    settings = get_settings()
+    async with _pools_lock:
+        pool = _pools.get(db_str)
+        if pool is None:
+            pool = await asyncpg.create_pool(
+                db_str,
+                min_size=0,
+                max_size=settings.pg_pool_max_size,
+                max_inactive_connection_lifetime=settings.pg_pool_max_idle_seconds,
+                statement_cache_size=0 if settings.pgbouncer_transaction_mode else 100,
+                max_cached_statement_lifetime=0,
+                init=functools.partial(_init_connection, db_str),
+                server_settings={'application_name': settings.application_name},
+            )
+            _pools[db_str] = pool
+    return pool
+
+
+async def close_pools():
+    """
+    Closes every connection pool. Called on application shutdown.
+    """
+    pools = list(_pools.values())
+    _pools.clear()
+    _pool_last_used.clear()
+    for pool in pools:
+        try:
+            await pool.close()
+        except Exception as e:
+            print(f"Warning: Could not close connection pool cleanly: {e}")
+
+
+async def _close_idle_pools(limit: int):
+    """
+    Closes the least recently used pools that nobody is using until at most limit
+    connections are open across all pools.
+    """
+    open_connections = sum(pool.get_size() for pool in _pools.values())
+    idle = sorted(
+        (db_str for db_str in _pools if not _pool_users.get(db_str)),
+        key=lambda db_str: _pool_last_used.get(db_str, 0.0),
+    )
+    closing = []
+    for db_str in idle:
+        if open_connections <= limit:
+            break
+        pool = _pools.pop(db_str)
+        _pool_last_used.pop(db_str, None)
+        open_connections -= pool.get_size()
+        closing.append(pool)
+    for pool in closing:
+        try:
+            await pool.close()
+        except Exception as e:
+            print(f"Warning: Could not close idle connection pool cleanly: {e}")
+
+
+@asynccontextmanager
+async def connect(db_str: str, timeout: float = None):
+    """
+    Acquires a pooled connection inside one unit of the global Postgres work budget
+    and releases it when the block exits. Every connection the monitor makes to the
+    monitored server should go through here.
+
+    Pools are per connection string, so idle connections to other databases are
+    closed when a new connection would take the open total past pg_max_concurrent_work,
+    and again after release. The monitor can briefly hold more backends only while
+    idle connections sit in pools that are also in use.
+
+    Args:
+        db_str: The full PostgreSQL connection string for the target database.
+        timeout: Optional seconds to wait for a pooled connection, including opening
+                 one, once the work budget is held. Raises asyncio.TimeoutError.
+
+    Yields:
+        A PooledConnection.
+    """
+    limit = get_settings().pg_max_concurrent_work
+    async with pg_work_slot():
+        _pool_users[db_str] = _pool_users.get(db_str, 0) + 1
+        try:
+            pool = await get_pool(db_str)
+            if pool.get_idle_size() == 0:
+                await _close_idle_pools(limit - 1) # Room for the connection about to open
+            async with pool.acquire(timeout=timeout) as conn:
+                yield PooledConnection(db_str, conn)
+        finally:
+            _pool_users[db_str] -= 1
+            if not _pool_users[db_str]:
+                del _pool_users[db_str]
+            _pool_last_used[db_str] = time.monotonic()
+        await _close_idle_pools(limit)
+
+
+async def open_async_request(db_str: str,
+                             sql_question: str,
+                             params: tuple = None,
+                             fetch_as_dict: bool = False):
+    """
+    Executes an asynchronous SQL query, optionally with parameters, and fetches results.
+    Borrows a pooled connection for the duration of the request.
+
+    Args:
+        db_str: The full PostgreSQL connection string for the target database.
+        sql_question: The SQL query string.
+        params: A tuple of parameters to pass to the query (asyncpg uses positional parameters like $1, $2).
+        fetch_as_dict: If True, fetches results as a list of dictionaries.
+                       Otherwise, returns a list of asyncpg.Record objects (which behave like tuples).
+
+    Returns:
+        A list of query results (dictionaries or asyncpg.Record objects).
+    """
+    try:
+        async with connect(db_str) as conn:
+            if params:
+                rows = await conn.fetch(sql_question, *params)
+            else:
+                rows = await conn.fetch(sql_question)
+
+        if fetch_as_dict:
+            return [dict(row) for row in rows]
+        else:
+            return rows
+    except Exception as e:
+        print(f"Error in open_async_request: {e}")
+        raise # Re-raise to propagate the error
@@ -1,4 +1,3 @@
-import os
 from urllib.parse import urlparse
 import asyncpg
 from asyncpg import exceptions
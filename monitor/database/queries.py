@@ -0,0 +1,410 @@
+# database/queries.py
+import asyncpg
+
+from monitor.settings import get_settings
+from monitor.database.connection import connect, on_connection_closed
+
+# The partition hierarchy rooted at the relation $1, or just $1 itself when it is
+# not partitioned (pg_partition_tree returns no rows for plain tables).
+_PARTITION_TREE = """
+    WITH tree AS (
+        SELECT relid, parentrelid, isleaf, level
+        FROM pg_partition_tree($1::text::regclass)
+        UNION ALL
+        SELECT $1::text::regclass, NULL, true, 0
+        WHERE NOT EXISTS (SELECT 1 FROM pg_partition_tree($1::text::regclass))
+    )
+"""
+
+# Every fixed monitor query is declared here once, by name. They are prepared on a
+# pooled connection the first time that connection runs them and reused afterwards.
+QUERIES = {
+    'list_databases': """
+        SELECT datname
+        FROM pg_database
+        WHERE datistemplate = false
+        AND datname NOT IN ('postgres', 'template0', 'template1');
+    """,
+    'list_public_tables': """
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = 'public';
+    """,
+    # Every public table with its columns in column order, one row per column
+    # (a NULL column_name for a table without columns).
+    'list_public_table_columns': """
+        SELECT t.table_name, c.column_name
+        FROM information_schema.tables t
+        LEFT JOIN information_schema.columns c
+            ON c.table_schema = t.table_schema AND c.table_name = t.table_name
+        WHERE t.table_schema = 'public'
+        ORDER BY t.table_name, c.ordinal_position;
+    """,
+    'list_table_columns': """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = $1
+        AND table_name = $2
+        ORDER BY ordinal_position;
+    """,
+    'database_size': "SELECT pg_database_size($1);",
+    'current_database_size': "SELECT pg_database_size(current_database());",
+    # Partitioned parents own no storage, so sizes are summed over the whole tree.
+    'table_total_size': _PARTITION_TREE + """
+        SELECT COALESCE(sum(pg_total_relation_size(relid)), 0)::bigint
+        FROM tree;
+    """,
+    'partition_tree': _PARTITION_TREE + """
+        SELECT t.relid::regclass::text AS partition,
+               t.parentrelid::regclass::text AS parent,
+               t.level,
+               t.isleaf,
+               pg_get_expr(c.relpartbound, c.oid) AS bound,
+               pg_total_relation_size(t.relid) AS size_bytes,
+               CASE WHEN t.isleaf THEN GREATEST(c.reltuples, 0)::bigint ELSE 0 END AS row_estimate
+        FROM tree t
+        JOIN pg_class c ON c.oid = t.relid
+        ORDER BY t.level, partition;
+    """,
+    # Non-NULL estimates per column from the planner statistics of each leaf partition,
+    # weighted by the leaf row estimates. $2 optionally restricts the leaves by name.
+    'column_non_null_estimates': _PARTITION_TREE + """
+        SELECT a.attname AS column_name,
+               COALESCE(sum(GREATEST(c.reltuples, 0) * (1 - COALESCE(s.null_frac, 0))), 0)::bigint AS non_null
+        FROM pg_attribute a
+        LEFT JOIN tree t ON t.isleaf
+            AND ($2::text[] IS NULL OR t.relid::regclass::text = ANY($2::text[]))
+        LEFT JOIN pg_class c ON c.oid = t.relid
+        LEFT JOIN pg_stats s ON s.schemaname = c.relnamespace::regnamespace::text
+            AND s.tablename = c.relname
+            AND s.attname = a.attname
+            AND NOT s.inherited
+        WHERE a.attrelid = $1::text::regclass
+        AND a.attnum > 0
+        AND NOT a.attisdropped
+        GROUP BY a.attnum, a.attname
+        ORDER BY a.attnum;
+    """,
+    # Size and row estimate of many tables at once, rolled up over each partition tree
+    # like the queries above. With $2 set it also returns the pg_stats non-NULL estimate
+    # of every column as a JSON object. Names resolve like table_total_size (optionally
+    # schema-qualified, quoted for mixed case); names that do not resolve come back with
+    # found = false.
+    'batch_table_stats': """
+        WITH requested AS (
+            SELECT name, to_regclass(name) AS relid
+            FROM unnest($1::text[]) AS name
+        ),
+        tree AS (
+            SELECT r.name, t.relid, t.isleaf
+            FROM requested r
+            CROSS JOIN LATERAL (
+                SELECT relid, isleaf FROM pg_partition_tree(r.relid)
+                UNION ALL
+                SELECT r.relid, true
+                WHERE NOT EXISTS (SELECT 1 FROM pg_partition_tree(r.relid))
+            ) t
+            WHERE r.relid IS NOT NULL
+        )
+        SELECT r.name AS table_name,
+               r.relid IS NOT NULL AS found,
+               sizes.size_bytes,
+               sizes.row_estimate,
+               estimates.column_estimates
+        FROM requested r
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(sum(pg_total_relation_size(t.relid)), 0)::bigint AS size_bytes,
+                   COALESCE(sum(GREATEST(c.reltuples, 0)) FILTER (WHERE t.isleaf), 0)::bigint AS row_estimate
+            FROM tree t
+            JOIN pg_class c ON c.oid = t.relid
+            WHERE t.name = r.name
+        ) sizes ON true
+        LEFT JOIN LATERAL (
+            SELECT json_object_agg(col.attname, col.non_null ORDER BY col.attnum) AS column_estimates
+            FROM (
+                SELECT a.attnum,
+                       a.attname,
+                       COALESCE(sum(GREATEST(c.reltuples, 0) * (1 - COALESCE(s.null_frac, 0))), 0)::bigint AS non_null
+                FROM pg_attribute a
+                LEFT JOIN tree t ON t.name = r.name AND t.isleaf
+                LEFT JOIN pg_class c ON c.oid = t.relid
+                LEFT JOIN pg_stats s ON s.schemaname = c.relnamespace::regnamespace::text
+                    AND s.tablename = c.relname
+                    AND s.attname = a.attname
+                    AND NOT s.inherited
+                WHERE $2::bool
+                AND a.attrelid = r.relid
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+                GROUP BY a.attnum, a.attname
+            ) col
+        ) estimates ON true;
+    """,
+    # Dead tuples, autovacuum history, vacuum/analyze progress and freeze age of every
+    # user table, plus the autovacuum settings and database freeze age, in one pass.
+    # A database without user tables still returns one row, with NULL table columns.
+    # Partitioned parents hold no data and have no relfrozenxid (0), so they are left
+    # out; their leaf partitions are listed as tables of their own.
+    'table_maintenance': """
+        SELECT s.relid::bigint AS relid,
+               s.schemaname,
+               s.relname,
+               s.n_live_tup,
+               s.n_dead_tup,
+               s.n_mod_since_analyze,
+               s.last_vacuum,
+               s.last_autovacuum,
+               s.last_analyze,
+               s.last_autoanalyze,
+               s.vacuum_count,
+               s.autovacuum_count,
+               s.analyze_count,
+               s.autoanalyze_count,
+               c.reltuples,
+               c.reloptions,
+               pg_total_relation_size(s.relid) AS size_bytes,
+               CASE WHEN c.relfrozenxid <> '0'::xid THEN age(c.relfrozenxid) END AS xid_age,
+               v.phase AS vacuum_phase,
+               v.heap_blks_total AS vacuum_heap_blks_total,
+               v.heap_blks_vacuumed AS vacuum_heap_blks_vacuumed,
+               a.phase AS analyze_phase,
+               a.sample_blks_total AS analyze_sample_blks_total,
+               a.sample_blks_scanned AS analyze_sample_blks_scanned,
+               g.vacuum_threshold,
+               g.vacuum_scale_factor,
+               g.freeze_max_age,
+               g.datfrozenxid_age
+        FROM (
+            SELECT d.oid AS datid,
+                   age(d.datfrozenxid) AS datfrozenxid_age,
+                   current_setting('autovacuum_vacuum_threshold')::float8 AS vacuum_threshold,
+                   current_setting('autovacuum_vacuum_scale_factor')::float8 AS vacuum_scale_factor,
+                   current_setting('autovacuum_freeze_max_age')::float8 AS freeze_max_age
+            FROM pg_database d
+            WHERE d.datname = current_database()
+        ) g
+        LEFT JOIN (pg_stat_user_tables s JOIN pg_class c ON c.oid = s.relid AND c.relkind <> 'p') ON true
+        LEFT JOIN pg_stat_progress_vacuum v ON v.relid = s.relid AND v.datid = g.datid
+        LEFT JOIN pg_stat_progress_analyze a ON a.relid = s.relid AND a.datid = g.datid;
+    """,
+    # Server-wide activity for the 'server' sampler. Block counters are cumulative and
+    # turned into an interval cache hit ratio by the caller. Lock waiters are the only
+    # candidates for pg_blocking_pids, which is too costly to call for every backend.
+    'server_activity': """
+        SELECT (SELECT sum(blks_hit) FROM pg_stat_database)::bigint AS blks_hit,
+               (SELECT sum(blks_read) FROM pg_stat_database)::bigint AS blks_read,
+               count(*) FILTER (WHERE backend_type = 'client backend') AS connections,
+               count(*) FILTER (WHERE backend_type = 'client backend' AND state = 'active') AS active_sessions,
+               count(*) FILTER (WHERE state LIKE 'idle in transaction%') AS idle_in_transaction,
+               count(*) FILTER (
+                   WHERE CASE WHEN wait_event_type = 'Lock' THEN cardinality(pg_blocking_pids(pid)) > 0 END
+               ) AS blocked_sessions,
+               current_setting('max_connections')::int AS max_connections
+        FROM pg_stat_activity;
+    """,
+    # Query text of a pg_stat_statements entry of the current database. Fails with
+    # UndefinedTableError when the extension is not installed there.
+    'statement_text': """
+        SELECT query
+        FROM pg_stat_statements
+        WHERE queryid = $1
+        AND dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        ORDER BY calls DESC
+        LIMIT 1;
+    """,
+    # Changes whenever a user relation, index or column is created, dropped or retyped,
+    # so cached plans of the old schema are not served.
+    'schema_fingerprint': """
+        SELECT md5(
+            COALESCE(string_agg(c.oid::text || ':' || c.relkind::text || ':' || c.relname, ',' ORDER BY c.oid), '')
+            || '|' ||
+            COALESCE((
+                SELECT string_agg(a.attrelid::text || ':' || a.attnum || ':' || a.atttypid, ',' ORDER BY a.attrelid, a.attnum)
+                FROM pg_attribute a
+                JOIN pg_class ac ON ac.oid = a.attrelid
+                JOIN pg_namespace an ON an.oid = ac.relnamespace
+                WHERE an.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND an.nspname NOT LIKE 'pg_toast%'
+                AND ac.relkind IN ('r', 'p', 'm', 'v', 'f')
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+            ), '')
+        )
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+        AND n.nspname NOT LIKE 'pg_toast%'
+        AND c.relkind IN ('r', 'p', 'i', 'I', 'm', 'v', 'f');
+    """,
+    # Replication, sampled on the primary. LSN positions are reported as byte
+    # offsets so deltas between samples give WAL rates.
+    'wal_position': """
+        SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::bigint AS wal_bytes,
+               current_setting('max_slot_wal_keep_size') AS max_slot_wal_keep_size;
+    """,
+    'replication_standbys': """
+        SELECT application_name,
+               client_addr::text AS client_addr,
+               state,
+               sync_state,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), sent_lsn)::bigint AS sent_lag_bytes,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), write_lsn)::bigint AS write_lag_bytes,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), flush_lsn)::bigint AS flush_lag_bytes,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), replay_lsn)::bigint AS replay_lag_bytes,
+               EXTRACT(EPOCH FROM write_lag)::float8 AS write_lag_seconds,
+               EXTRACT(EPOCH FROM flush_lag)::float8 AS flush_lag_seconds,
+               EXTRACT(EPOCH FROM replay_lag)::float8 AS replay_lag_seconds
+        FROM pg_stat_replication
+        ORDER BY application_name, client_addr;
+    """,
+    'replication_slots': """
+        SELECT slot_name,
+               slot_type,
+               database,
+               active,
+               wal_status,
+               safe_wal_size,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), restart_lsn)::bigint AS retained_bytes,
+               pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn)::bigint AS confirmed_flush_lag_bytes
+        FROM pg_replication_slots
+        ORDER BY slot_name;
+    """,
+    # A replica that has replayed everything it received while its WAL receiver is
+    # streaming is not lagging, even if the primary has been idle and the last replayed
+    # transaction is old. Without a streaming receiver it may have received nothing
+    # for a long time, so it only counts as current as its last replayed transaction.
+    'replica_lag': """
+        SELECT pg_is_in_recovery() AS in_recovery,
+               streaming.streaming,
+               CASE
+                   WHEN streaming.streaming
+                    AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                   ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+               END AS lag_seconds
+        FROM (
+            SELECT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming
+        ) streaming;
+    """,
+}
+
+# statement key of a pooled connection -> names of the queries prepared on it
+_prepared = {}
+
+# query name -> counters
+_stats = {
+    name: {'prepares': 0, 'hits': 0, 'invalidations': 0, 'unprepared': 0}
+    for name in QUERIES
+}
+
+
+def _forget_stale_connections(statement_key: tuple):
+    db_str, pid, generation = statement_key
+    for key in [k for k in _prepared if k[:2] == (db_str, pid) and k[2] != generation]:
+        del _prepared[key]
+
+
+def _forget_connection(statement_key: tuple):
+    _prepared.pop(statement_key, None)
+
+
+on_connection_closed(_forget_connection)
+
+
+def _count_use(conn, name: str):
+    prepared = _prepared.get(conn.statement_key)
+    if prepared is None:
+        _forget_stale_connections(conn.statement_key)
+        prepared = _prepared[conn.statement_key] = set()
+
+    if name in prepared:
+        _stats[name]['hits'] += 1
+    else:
+        prepared.add(name)
+        _stats[name]['prepares'] += 1
+
+
+async def run_query(conn, name: str, *args, method: str = 'fetch'):
+    """
+    Runs a catalog query on a pooled connection.
+
+    The statement is prepared server-side the first time a connection runs it and kept
+    in that connection's asyncpg statement cache, which outlives the pool checkout, so
+    later runs on the same connection skip parse and plan. If the server reports the
+    cached plan as invalid after a schema change, the cache is dropped and the query
+    retried once. In PgBouncer transaction-pooling mode nothing is kept server-side.
+
+    Args:
+        conn: A PooledConnection from monitor.database.connection.connect.
+        name: A key of QUERIES.
+        *args: Positional query parameters.
+        method: 'fetch', 'fetchrow' or 'fetchval'.
+
+    Returns:
+        Whatever the asyncpg method returns.
+    """
+    if get_settings().pgbouncer_transaction_mode:
+        _stats[name]['unprepared'] += 1
+        return await getattr(conn, method)(QUERIES[name], *args)
+
+    _count_use(conn, name)
+    try:
+        return await getattr(conn, method)(QUERIES[name], *args)
+    except asyncpg.exceptions.InvalidCachedStatementError:
+        await invalidate_statements(conn)
+        _count_use(conn, name)
+        return await getattr(conn, method)(QUERIES[name], *args)
+
+
+async def catalog_request(db_str: str,
+                          name: str,
+                          params: tuple = None,
+                          fetch_as_dict: bool = False):
+    """
+    Same as open_async_request, but runs the named catalog query as a prepared statement.
+
+    Args:
+        db_str: The full PostgreSQL connection string for the target database.
+        name: A key of QUERIES.
+        params: A tuple of parameters to pass to the query.
+        fetch_as_dict: If True, fetches results as a list of dictionaries.
+
+    Returns:
+        A list of query results (dictionaries or asyncpg.Record objects).
+    """
+    try:
+        async with connect(db_str) as conn:
+            rows = await run_query(conn, name, *(params or ()))
+
+        if fetch_as_dict:
+            return [dict(row) for row in rows]
+        else:
+            return rows
+    except Exception as e:
+        print(f"Error in catalog_request '{name}': {e}")
+        raise
+
+
+async def invalidate_statements(conn):
+    """
+    Drops the cached statements of every pooled connection to the same connection
+    string as conn, so they are prepared again on next use. Call it after the monitor
+    itself changes the schema.
+
+    Args:
+        conn: A PooledConnection from monitor.database.connection.connect.
+    """
+    await conn.reload_schema_state()
+    for key in [k for k in _prepared if k[0] == conn.db_str]:
+        for name in _prepared.pop(key):
+            _stats[name]['invalidations'] += 1
+
+
+def statement_cache_stats() -> dict:
+    """
+    Returns the per-query prepare/hit/invalidation counters.
+    """
+    return {
+        'pgbouncer_transaction_mode': get_settings().pgbouncer_transaction_mode,
+        'connections': len(_prepared),
+        'queries': {name: dict(counters) for name, counters in _stats.items()},
+    }
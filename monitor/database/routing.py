@@ -0,0 +1,114 @@
+# database/routing.py
+import asyncio
+import time
+
+from monitor.settings import get_settings
+from monitor.admission import AdmissionRejected
+from monitor.database.connection import connect
+from monitor.database.queries import run_query
+
+# host:port -> {'healthy': bool, 'lag_seconds': float | None, 'error': str | None}
+_replica_state = {}
+_last_probe = 0.0
+_probe_lock = asyncio.Lock()
+
+
+async def probe_replica(host: str, base_conn_string: str) -> dict:
+    """
+    Measures the replay lag of one replica via pg_last_xact_replay_timestamp(). A
+    replica counts as fully caught up only while its WAL receiver is streaming.
+
+    Returns:
+        A dictionary with 'healthy', 'lag_seconds' and 'error' keys. A replica is
+        healthy when it answers within replica_probe_timeout_seconds, is in recovery
+        and is within max_replica_lag_seconds.
+    """
+    timeout = get_settings().replica_probe_timeout_seconds
+    try:
+        # Bounded, so an unreachable replica cannot stall the probe round (and every
+        # read-routed request waiting on it) for the default connect timeout
+        async with connect(f"{base_conn_string}/postgres", timeout=timeout) as conn:
+            row = await asyncio.wait_for(run_query(conn, 'replica_lag', method='fetchrow'), timeout)
+    except AdmissionRejected:
+        raise
+    except asyncio.TimeoutError:
+        print(f"Warning: Replica '{host}' did not answer within {timeout} seconds.")
+        return {'healthy': False, 'lag_seconds': None, 'error': f"no answer within {timeout} seconds"}
+    except Exception as e:
+        print(f"Warning: Replica '{host}' is unreachable: {e}")
+        return {'healthy': False, 'lag_seconds': None, 'error': str(e)}
+
+    if not row['in_recovery']:
+        return {'healthy': False, 'lag_seconds': None, 'error': 'not in recovery'}
+
+    lag_seconds = float(row['lag_seconds']) if row['lag_seconds'] is not None else None
+    healthy = lag_seconds is not None and lag_seconds <= get_settings().max_replica_lag_seconds
+    error = None if row['streaming'] else 'WAL receiver not streaming'
+    return {'healthy': healthy, 'lag_seconds': lag_seconds, 'error': error}
+
+
+async def refresh_replica_state(force: bool = False) -> dict:
+    """
+    Probes every configured replica, at most once per replica_probe_interval_seconds
+    unless force is True. Concurrent callers share a single probe round.
+    """
+    global _last_probe
+
+    settings = get_settings()
+    replica_conn_strings = settings.replica_conn_strings
+    if not replica_conn_strings:
+        return _replica_state
+
+    async with _probe_lock:
+        if not force and time.monotonic() - _last_probe < settings.replica_probe_interval_seconds:
+            return _replica_state
+
+        hosts = list(replica_conn_strings)
+        results = await asyncio.gather(
+            *(probe_replica(host, replica_conn_strings[host]) for host in hosts)
+        )
+        _replica_state.clear()
+        _replica_state.update(zip(hosts, results))
+        _last_probe = time.monotonic()
+
+    return _replica_state
+
+
+async def read_base_conn_string(fresh: bool = False) -> str:
+    """
+    Returns the base connection string (without database) for read-only analysis:
+    the least-lagged healthy replica, or the primary when fresh data is required
+    or no replica qualifies.
+    """
+    settings = get_settings()
+    if fresh or not settings.replica_conn_strings:
+        return settings.base_conn_string
+
+    state = await refresh_replica_state()
+    healthy = [(info['lag_seconds'], host) for host, info in state.items() if info['healthy']]
+    if not healthy:
+        return settings.base_conn_string
+
+    _, host = min(healthy)
+    return settings.replica_conn_strings[host]
+
+
+async def read_conn_string(db_name: str, fresh: bool = False) -> str:
+    """
+    Returns the connection string to use for read-only analysis of db_name.
+    """
+    return f"{await read_base_conn_string(fresh)}/{db_name}"
+
+
+def primary_conn_string(db_name: str) -> str:
+    """
+    Returns the primary connection string for db_name. Use it for writes and DDL.
+    """
+    return get_settings().conn_string(db_name)
+
+
+def replica_status() -> dict:
+    """
+    Returns the last probed state of every configured replica.
+    """
+    return {host: dict(info) for host, info in _replica_state.items()}
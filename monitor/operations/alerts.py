@@ -0,0 +1,11 @@
+# monitor/operations/alerts.py
+
+from monitor.alerts import alert_engine
+from monitor.collector import get_snapshot
+
+def get_alerts():
+    return get_snapshot('alerts')
+def get_alert_rules():
+    return [rule.describe() for rule in alert_engine.get_rules()]
+def register_alerts(collector):
+    collector.on_tick(alert_engine.evaluate)
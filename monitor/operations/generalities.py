@@ -1,12 +1,38 @@
 # monitor/operations/generalities.py
 
-from monitor.database.ask_db_generalities import *
+from monitor.database.ask_db_generalities import (
+    get_db_connection_strings_and_tables_dict,
+    get_dbs_general_size,
+    get_one_db_size,
+    get_table_partitions,
+    get_table_size,
+)
+from monitor.database.ask_db_server import server_activity
+from monitor.collector import get_snapshot
+from monitor.database.queries import statement_cache_stats
+from monitor.database.routing import refresh_replica_state, replica_status
+from monitor.settings import get_settings
 
 async def get_general_dict():
     return await get_db_connection_strings_and_tables_dict()
 async def get_general_size():
     return await get_dbs_general_size()
-async def get_db_size(db_name):
-    return await get_one_db_size(db_name)
-async def get_one_table_size(db_name, table_name):
-    return await get_table_size(db_name, table_name)
\ No newline at end of file
+async def get_db_size(db_name, fresh=False):
+    return await get_one_db_size(db_name, fresh)
+async def get_one_table_size(db_name, table_name, fresh=False):
+    return await get_table_size(db_name, table_name, fresh)
+async def get_one_table_partitions(db_name, table_name, fresh=False):
+    return await get_table_partitions(db_name, table_name, fresh)
+async def get_replica_status():
+    await refresh_replica_state()
+    return replica_status()
+async def get_statement_cache_stats():
+    return statement_cache_stats()
+def get_snapshot_general_dict():
+    return get_snapshot('general_dict', 2 * get_settings().general_dict_sample_interval_seconds)
+def get_snapshot_general_size():
+    return get_snapshot('general_size')
+def register_samplers(collector):
+    collector.register_sampler('general_dict', get_general_dict, get_settings().general_dict_sample_interval_seconds)
+    collector.register_sampler('general_size', get_general_size)
+    collector.register_sampler('server', server_activity, get_settings().server_sample_interval_seconds)
@@ -0,0 +1,13 @@
+# monitor/operations/queries.py
+
+from monitor.collector import get_snapshot
+from monitor.database.ask_db_plans import explain_query, tracked_plans
+from monitor.settings import get_settings
+
+async def get_explain(db_name, sql=None, queryid=None, analyze=False, fresh=False, track=False):
+    return await explain_query(db_name, sql, queryid, analyze, fresh, track)
+def get_tracked_plans():
+    # Tracked plans are re-sampled rarely, an old sample is still the latest known plan
+    return get_snapshot('plans', float('inf')) or {}
+def register_samplers(collector):
+    collector.register_sampler('plans', tracked_plans, get_settings().explain_sample_interval_seconds)
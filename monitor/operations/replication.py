@@ -0,0 +1,13 @@
+# monitor/operations/replication.py
+
+from monitor.collector import get_snapshot
+from monitor.database.ask_db_replication import replication_status
+from monitor.settings import get_settings
+
+async def get_replication_status():
+    return await replication_status()
+def get_snapshot_replication_status():
+    return get_snapshot('replication', 2 * get_settings().replication_sample_interval_seconds)
+def register_samplers(collector):
+    collector.register_sampler('replication', replication_status,
+                               get_settings().replication_sample_interval_seconds)
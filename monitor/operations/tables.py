@@ -1,8 +1,15 @@
 # monitor/operations/tables.py
 
-from monitor.database.ask_db_tables import *
+from monitor.database.ask_db_maintenance import all_databases_maintenance, table_maintenance
+from monitor.database.ask_db_tables import batch_table_stats, delete_table_with_confirmation, table_columns_dict
 
-async def get_table_columns_dict(db_name, table_name):
-    return await table_columns_dict(db_name, table_name)
+async def get_table_columns_dict(db_name, table_name, fresh=False, mode='exact', partitions=None):
+    return await table_columns_dict(db_name, table_name, fresh, mode, partitions)
+async def get_batch_table_stats(items, fresh=False):
+    return await batch_table_stats(items, fresh)
 async def get_delete_table(db_name, table_name):
     return await delete_table_with_confirmation(db_name, table_name)
+async def get_table_maintenance(db_name):
+    return await table_maintenance(db_name)
+def register_samplers(collector):
+    collector.register_sampler('maintenance', all_databases_maintenance)
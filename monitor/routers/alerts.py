@@ -0,0 +1,30 @@
+# monitor.routers alerts.py
+
+from typing import Literal
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from monitor.operations.alerts import get_alert_rules, get_alerts
+
+router = APIRouter()
+
+@router.get("/alerts")
+async def api_get_alerts(state: Literal['firing', 'pending', 'resolved'] = None):
+    try:
+        alerts = get_alerts()
+        if alerts is None:
+            return JSONResponse(content={"error": "No recent alert evaluation, is the collector running?"},
+                                status_code=503)
+        if state is not None:
+            alerts = {'evaluated_at': alerts['evaluated_at'], state: alerts[state]}
+        return JSONResponse(content=alerts)
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
+@router.get("/alerts/rules")
+async def api_get_alert_rules():
+    try:
+        return JSONResponse(content=get_alert_rules())
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
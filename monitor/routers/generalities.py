@@ -1,41 +1,95 @@
 # monitor.routers generalities.py
 
-import asyncio
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
-from monitor.operations.generalities import *
+from monitor.admission import AdmissionRejected, admission_stats, admit
+from monitor.operations.generalities import (
+    get_db_size,
+    get_general_dict,
+    get_general_size,
+    get_one_table_partitions,
+    get_one_table_size,
+    get_replica_status,
+    get_snapshot_general_dict,
+    get_snapshot_general_size,
+    get_statement_cache_stats,
+)
 
 router = APIRouter()
 
 @router.get("/general/general_dict")
 async def api_get_general_dict():
     try:
-        general_dict = await get_general_dict() 
+        general_dict = get_snapshot_general_dict()
+        if general_dict is None:
+            async with admit("catalog"):
+                general_dict = await get_general_dict()
         return JSONResponse(content=general_dict)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
 @router.get("/general/general_size")
 async def api_get_general_size():
     try:
-        general_size = await get_general_size()
+        general_size = get_snapshot_general_size()
+        if general_size is None:
+            async with admit("catalog"):
+                general_size = await get_general_size()
         return JSONResponse(content=general_size)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
 @router.get("/general/{db_name}/size")
-async def api_get_db_size(db_name):
+async def api_get_db_size(db_name, fresh: bool = False):
     try:
-        one_db_size = await get_db_size(db_name) 
+        async with admit("cheap"):
+            one_db_size = await get_db_size(db_name, fresh) 
         return JSONResponse(content=one_db_size)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
 @router.get("/general/{db_name}/{table_name}/size")
-async def api_get_one_table_size(db_name, table_name):
+async def api_get_one_table_size(db_name, table_name, fresh: bool = False):
     try:
-        one_table_size = await get_one_table_size(db_name, table_name) 
+        async with admit("cheap"):
+            one_table_size = await get_one_table_size(db_name, table_name, fresh) 
         return JSONResponse(content=one_table_size)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
-        return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
+@router.get("/general/{db_name}/{table_name}/partitions")
+async def api_get_one_table_partitions(db_name, table_name, fresh: bool = False):
+    try:
+        async with admit("cheap"):
+            partitions = await get_one_table_partitions(db_name, table_name, fresh)
+        return JSONResponse(content=partitions)
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
+@router.get("/general/admission")
+async def api_get_admission_stats():
+    return JSONResponse(content=admission_stats())
+@router.get("/general/replicas")
+async def api_get_replica_status():
+    try:
+        async with admit("cheap"):
+            replicas = await get_replica_status()
+        return JSONResponse(content=replicas)
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something: {e}"}, status_code=500)
+@router.get("/general/statement_cache")
+async def api_get_statement_cache_stats():
+    return JSONResponse(content=await get_statement_cache_stats())
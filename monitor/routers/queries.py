@@ -0,0 +1,40 @@
+# monitor.routers queries.py
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from monitor.admission import AdmissionRejected, admit
+from monitor.operations.queries import get_explain, get_tracked_plans
+
+router = APIRouter()
+
+class ExplainRequest(BaseModel):
+    db_name: str
+    sql: str | None = None
+    queryid: int | None = None
+    analyze: bool = False
+    track: bool = False
+
+@router.post("/queries/explain")
+async def api_get_explain(request: ExplainRequest, fresh: bool = False):
+    try:
+        async with admit("scan" if request.analyze else "cheap"):
+            report = await get_explain(request.db_name, request.sql, request.queryid,
+                                       request.analyze, fresh, request.track)
+        if report is None:
+            return JSONResponse(content={"error": "Something went wrong explaining the query."}, status_code=500)
+        if 'error' in report:
+            return JSONResponse(content=report, status_code=400)
+        return JSONResponse(content=report)
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
+@router.get("/queries/plans")
+async def api_get_tracked_plans():
+    try:
+        return JSONResponse(content=get_tracked_plans())
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
@@ -0,0 +1,22 @@
+# monitor.routers replication.py
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from monitor.admission import AdmissionRejected, admit
+from monitor.operations.replication import get_replication_status, get_snapshot_replication_status
+
+router = APIRouter()
+
+@router.get("/replication")
+async def api_get_replication_status(fresh: bool = False):
+    try:
+        status = None if fresh else get_snapshot_replication_status()
+        if status is None:
+            async with admit("cheap"):
+                status = await get_replication_status()
+        return JSONResponse(content=status)
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
@@ -1,25 +1,75 @@
 # monitor.routers tables.py
 
-import asyncio
+from typing import Literal
+
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
-from monitor.operations.tables import *
+from pydantic import BaseModel
+from monitor.admission import AdmissionRejected, admit
+from monitor.database.ask_db_tables import BATCH_METRICS
+from monitor.operations.tables import (
+    get_batch_table_stats,
+    get_delete_table,
+    get_table_columns_dict,
+    get_table_maintenance,
+)
+from monitor.settings import get_settings
 
 router = APIRouter()
 
+class TableStatsItem(BaseModel):
+    db_name: str
+    table_name: str
+    metrics: list[Literal[BATCH_METRICS]] = ['size']
+
 @router.get("/tables/column_dicts/{db_name}/{table_name}")
-async def api_get_table_columns_dict(db_name,table_name):
+async def api_get_table_columns_dict(db_name,table_name, fresh: bool = False,
+                                     mode: Literal['exact', 'estimate'] = 'exact',
+                                     partitions: str = None):
     try:
-        table_dict = await get_table_columns_dict(db_name,table_name) 
+        partition_list = [p.strip() for p in partitions.split(",") if p.strip()] if partitions else None
+        async with admit("scan" if mode == 'exact' else "cheap"):
+            table_dict = await get_table_columns_dict(db_name,table_name, fresh, mode, partition_list)
         return JSONResponse(content=table_dict)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
 @router.get("/tables/delete/{db_name}/{table_name}")
 async def api_get_delete_table(db_name,table_name):
     try:
-        await get_delete_table(db_name,table_name) 
+        async with admit("cheap"):
+            await get_delete_table(db_name,table_name) 
         return JSONResponse(content={f"{table_name}":"deleted"})
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
+@router.get("/tables/maintenance/{db_name}")
+async def api_get_table_maintenance(db_name):
+    try:
+        async with admit("cheap"):
+            maintenance = await get_table_maintenance(db_name)
+        return JSONResponse(content=maintenance)
+    except AdmissionRejected as e:
+        return e.to_response()
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
+@router.post("/tables/batch_stats")
+async def api_get_batch_table_stats(items: list[TableStatsItem], fresh: bool = False):
+    try:
+        max_items = get_settings().batch_max_items
+        if len(items) > max_items:
+            return JSONResponse(content={"error": f"At most {max_items} items per batch."}, status_code=413)
+        scans = any('column_counts' in item.metrics for item in items)
+        async with admit("scan" if scans else "catalog"):
+            stats = await get_batch_table_stats([item.model_dump() for item in items], fresh)
+        return JSONResponse(content=stats)
+    except AdmissionRejected as e:
+        return e.to_response()
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse(content={"error": f"Something:{e}"}, status_code=500)
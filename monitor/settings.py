@@ -0,0 +1,175 @@
+# monitor/settings.py
+from functools import lru_cache
+from pathlib import Path
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+ENV_FILE = Path(__file__).resolve().parent / '.env'
+
+
+class Settings(BaseSettings):
+    """
+    Monitor configuration, read from monitor/.env and the environment.
+    Values in monitor/.env win over the environment, so a shell USER does not
+    shadow the database user.
+    """
+
+    model_config = SettingsConfigDict(env_file=ENV_FILE, extra='ignore')
+
+    user: str | None = None
+    password: str | None = None
+    host: str = "host.docker.internal" # Host's PostgreSQL from inside Docker Desktop
+    port: int = 5432
+    default_database_name: str | None = None
+
+    # Application name reported in pg_stat_activity for every monitor connection.
+    application_name: str = "psql_monitor"
+
+    # Admission control: per cost class concurrency limits and bounded wait queues.
+    # 'cheap' covers single catalog lookups, 'catalog' covers sweeps over every
+    # database, 'scan' covers full-table reads such as column counts.
+    admission_limits: dict = {
+        'cheap': {'max_concurrent': 8, 'max_queue': 32, 'wait_seconds': 5.0, 'retry_after': 1},
+        'catalog': {'max_concurrent': 2, 'max_queue': 4, 'wait_seconds': 15.0, 'retry_after': 5},
+        'scan': {'max_concurrent': 1, 'max_queue': 2, 'wait_seconds': 30.0, 'retry_after': 10},
+    }
+
+    # Global budget on concurrent Postgres connections held by the monitor. It is shared
+    # by every worker on the host through flocks on the pg_work_lock_path.<n> slot files.
+    pg_max_concurrent_work: int = 4
+    pg_work_wait_seconds: float = 10.0
+    pg_work_lock_path: str = '/tmp/psql_monitor_pg_work'
+
+    # Connection pools, one per connection string. Idle connections are closed after
+    # pg_pool_max_idle_seconds. Set pgbouncer_transaction_mode when connecting through
+    # PgBouncer in transaction-pooling mode, which cannot keep server-side prepared statements.
+    pg_pool_max_size: int = 2
+    pg_pool_max_idle_seconds: float = 60.0
+    pgbouncer_transaction_mode: bool = False
+
+    # Optional read replicas as a comma separated list of host:port pairs, e.g.
+    # REPLICA_HOSTS="replica1:5432,replica2:5432". Read-only analysis is routed to the
+    # least-lagged healthy replica whose replay lag is under max_replica_lag_seconds,
+    # and falls back to the primary when none qualifies. A replica that does not answer
+    # a probe within replica_probe_timeout_seconds counts as unhealthy.
+    replica_hosts: str = ""
+    max_replica_lag_seconds: float = 30.0
+    replica_probe_interval_seconds: float = 10.0
+    replica_probe_timeout_seconds: float = 3.0
+
+    # Background collection. With several uvicorn workers on one host, a single worker
+    # is elected collector (collector_lock: 'file' for a flock on collector_lock_path,
+    # 'advisory' for a Postgres advisory lock) and writes samples into the SQLite
+    # snapshot store, which every worker reads. Admission limits and pools above are per
+    # worker; the Postgres work budget is per host.
+    collector_enabled: bool = True
+    collector_lock: str = 'file'
+    collector_lock_path: str = '/tmp/psql_monitor_collector.lock'
+    collector_advisory_lock_key: int = 746567383
+    collector_tick_seconds: float = 5.0
+    collect_interval_seconds: float = 60.0
+    snapshot_store_path: str = '/tmp/psql_monitor_snapshots.sqlite3'
+    snapshot_max_age_seconds: float = 180.0
+    # The database/table/column structure rarely changes, so it is sampled less often.
+    general_dict_sample_interval_seconds: float = 600.0
+
+    # Table maintenance: dead-tuple rates are measured between samples at least
+    # maintenance_min_sample_seconds apart, and a table is flagged at risk once its
+    # dead tuples or freeze age reach this fraction of the autovacuum trigger.
+    maintenance_min_sample_seconds: float = 30.0
+    maintenance_risk_threshold: float = 0.8
+
+    # Replication: WAL and slot retention rates are measured between samples at least
+    # replication_min_sample_seconds apart. Slots are projected against safe_wal_size when
+    # max_slot_wal_keep_size is set, otherwise against wal_retention_budget_bytes (for
+    # example the free space of the WAL volume) when given.
+    replication_min_sample_seconds: float = 30.0
+    replication_sample_interval_seconds: float = 30.0
+    wal_retention_budget_bytes: int | None = None
+
+    # Batch table statistics: at most batch_max_items items per request, and at most
+    # batch_max_parallel catalog queries or column scans in flight for one batch.
+    batch_max_items: int = 500
+    batch_max_parallel: int = 2
+
+    # Server activity (cache hit ratio, sessions, lock waits), sampled by the collector.
+    server_sample_interval_seconds: float = 10.0
+
+    # Alerts. Rules are evaluated by the collector after every tick against the stored
+    # snapshots only, never with queries of their own. A rule watches the numeric series
+    # matching its metric glob, '<snapshot>.<path>' (e.g. 'maintenance.*.datfrozenxid_age'),
+    # either directly ('threshold') or as a change per per_seconds ('rate', measured over
+    # at least alert_rate_min_sample_seconds). It fires once the condition held for
+    # for_seconds and resolves once it has been clear for resolve_after_seconds
+    # (default alert_hold_down_seconds). Rules from alert_rules_path, a JSON list, are
+    # added to alert_rules. Transitions are appended as JSON lines to alert_file_path
+    # and POSTed to alert_webhook_url when set.
+    alert_rules: list[dict] = [
+        {'name': 'table_growth', 'metric': 'maintenance.*.tables.*.size_bytes', 'kind': 'rate',
+         'per_seconds': 86400, 'op': '>', 'threshold': 5 * 1024 ** 3, 'for_seconds': 3600},
+        {'name': 'cache_hit_ratio', 'metric': 'server.cache_hit_ratio', 'op': '<',
+         'threshold': 0.95, 'for_seconds': 300},
+        {'name': 'blocked_sessions', 'metric': 'server.blocked_sessions', 'op': '>',
+         'threshold': 10, 'for_seconds': 30, 'severity': 'critical'},
+        {'name': 'xid_wraparound', 'metric': 'maintenance.*.datfrozenxid_age', 'op': '>',
+         'threshold': 1.5e9, 'severity': 'critical'},
+    ]
+    alert_rules_path: str | None = None
+    alert_hold_down_seconds: float = 60.0
+    alert_rate_min_sample_seconds: float = 600.0
+    alert_history_size: int = 100
+    alert_file_path: str | None = None
+    alert_webhook_url: str | None = None
+
+    # Query plans. EXPLAIN runs in a read-only transaction under explain_statement_timeout_ms,
+    # on a replica unless fresh is set. EXPLAIN ANALYZE executes the query, so it is
+    # refused unless the query goes to a replica. Plans are cached for explain_cache_seconds by
+    # normalized query and schema fingerprint, which is recomputed at most every
+    # explain_fingerprint_seconds per database. A node is hot when its own time (ANALYZE)
+    # or cost reaches explain_hot_node_fraction of the whole plan. Tracked queries, from
+    # explain_tracked_queries ({'db_name', and 'sql' or 'queryid'}) or added with
+    # track=true, are re-planned every explain_sample_interval_seconds and flagged when
+    # their plan shape changes.
+    explain_statement_timeout_ms: int = 5000
+    explain_cache_seconds: float = 300.0
+    explain_fingerprint_seconds: float = 30.0
+    explain_hot_node_fraction: float = 0.2
+    explain_tracked_queries: list[dict] = []
+    explain_sample_interval_seconds: float = 300.0
+
+    @classmethod
+    def settings_customise_sources(cls, settings_cls, init_settings, env_settings,
+                                   dotenv_settings, file_secret_settings):
+        return init_settings, dotenv_settings, env_settings, file_secret_settings
+
+    @property
+    def base_conn_string(self) -> str:
+        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}"
+
+    @property
+    def default_conn_string(self) -> str:
+        return f"{self.base_conn_string}/{self.default_database_name}"
+
+    @property
+    def replica_conn_strings(self) -> dict:
+        hosts = [h.strip() for h in self.replica_hosts.split(",") if h.strip()]
+        return {h: f"postgresql://{self.user}:{self.password}@{h}" for h in hosts}
+
+    def conn_string(self, db_name: str) -> str:
+        return f"{self.base_conn_string}/{db_name}"
+
+    def summary(self) -> str:
+        """
+        Returns a one-line description of the connection settings with the password masked.
+        """
+        password = '*' * len(self.password or '')
+        return (f"USER='{self.user}' PASSWORD='{password}' HOST='{self.host}' "
+                f"PORT={self.port} DEFAULT_DATABASE_NAME='{self.default_database_name}'")
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Returns the process-wide Settings, reading .env and the environment on first call.
+    """
+    return Settings()